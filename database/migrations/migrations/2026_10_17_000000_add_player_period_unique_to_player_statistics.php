@@ -0,0 +1,43 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Database\Capsule\Manager as DB;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     */
+    public function up(): void
+    {
+        // Дубликаты (player_id, period_start) с разным period_end не дают создать индекс:
+        // оставляем по одной, последней обновленной строке
+        DB::statement('
+            DELETE FROM player_statistics ps
+            USING (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY player_id, period_start
+                    ORDER BY COALESCE(last_updated, updated_at, created_at) DESC NULLS LAST, id DESC
+                ) AS rn
+                FROM player_statistics
+            ) ranked
+            WHERE ps.id = ranked.id AND ranked.rn > 1
+        ');
+
+        DB::schema()->table('player_statistics', function (Blueprint $table) {
+            // Цель для INSERT ... ON CONFLICT (player_id, period_start) в парсере HLTV
+            $table->unique(['player_id', 'period_start'], 'uq_player_stats_player_period');
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        DB::schema()->table('player_statistics', function (Blueprint $table) {
+            $table->dropUnique('uq_player_stats_player_period');
+        });
+    }
+};
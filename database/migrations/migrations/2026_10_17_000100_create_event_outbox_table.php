@@ -0,0 +1,40 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Database\Capsule\Manager as DB;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     */
+    public function up(): void
+    {
+        DB::schema()->create('event_outbox', function (Blueprint $table) {
+            $table->id();
+            $table->string('event_type', 50)->comment('match.created, team.ranking_changed и т.д.');
+            $table->string('routing_key', 100)->comment('Ключ маршрутизации RabbitMQ');
+            $table->jsonb('payload')->comment('Тело события');
+
+            // Публикация
+            $table->integer('attempts')->default(0)->comment('Неудачных попыток публикации');
+            $table->text('last_error')->nullable()->comment('Последняя ошибка публикации');
+            $table->timestamp('created_at')->useCurrent();
+            $table->timestamp('published_at')->nullable()->comment('Время подтверждения брокером (NULL — не опубликовано)');
+
+            $table->index('published_at', 'idx_event_outbox_published_at');
+        });
+
+        // Частичный индекс для выборки неопубликованных событий парсером HLTV
+        DB::statement('CREATE INDEX idx_event_outbox_unpublished ON event_outbox (id) WHERE published_at IS NULL');
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        DB::schema()->dropIfExists('event_outbox');
+    }
+};
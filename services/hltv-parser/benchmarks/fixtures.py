@@ -0,0 +1,302 @@
+"""
+HTML fixtures of HLTV pages for benchmarks and the local HLTV stand-in
+Корпус страниц HLTV: записанные парсером страницы из дискового кэша и синтетические страницы
+
+Структура каталога ``FIXTURES_DIR``::
+
+    <page_type>/<name>.html.gz   страница (ranking, player, stats, team_stats, matches, match)
+    index.json                   путь URL (например, /stats/players/7998/s1mple) -> файл
+"""
+
+import os
+import gzip
+import json
+import random
+import shutil
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from config.settings import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_DIR = os.getenv(
+    'HLTV_FIXTURES_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+)
+PAGE_TYPES = ('ranking', 'player', 'stats', 'team_stats', 'matches', 'match')
+
+_INDEX_FILE = 'index.json'
+
+
+def _read_index(fixtures_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(fixtures_dir, _INDEX_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(fixtures_dir: str, index: Dict[str, str]) -> None:
+    with open(os.path.join(fixtures_dir, _INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+
+
+def _save(fixtures_dir: str, index: Dict[str, str], page_type: str, name: str, path: str, html: str) -> None:
+    relative = os.path.join(page_type, f"{name}.html.gz")
+    os.makedirs(os.path.join(fixtures_dir, page_type), exist_ok=True)
+    with gzip.open(os.path.join(fixtures_dir, relative), 'wt', encoding='utf-8') as f:
+        f.write(html)
+    index[path] = relative
+
+
+def load(page_type: str, fixtures_dir: str = FIXTURES_DIR) -> List[Tuple[str, str]]:
+    """Все страницы одного типа: список (имя файла, HTML)"""
+    directory = os.path.join(fixtures_dir, page_type)
+    if not os.path.isdir(directory):
+        return []
+    pages = []
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith('.html.gz'):
+            with gzip.open(os.path.join(directory, file_name), 'rt', encoding='utf-8') as f:
+                pages.append((file_name, f.read()))
+    return pages
+
+
+def iter_index(fixtures_dir: str = FIXTURES_DIR) -> Iterator[Tuple[str, str]]:
+    """Пары (путь URL, абсолютный путь к файлу страницы)"""
+    for path, relative in _read_index(fixtures_dir).items():
+        yield path, os.path.join(fixtures_dir, relative)
+
+
+def import_from_cache(cache_dir: str = CACHE_DIR, fixtures_dir: str = FIXTURES_DIR) -> int:
+    """
+    Скопировать в корпус реальные страницы HLTV из дискового кэша парсера (PageCache).
+
+    Returns:
+        Количество импортированных страниц.
+    """
+    from urllib.parse import urlparse
+    from page_cache import PageCache
+
+    cache = PageCache(cache_dir=cache_dir, enabled=True)
+    index = _read_index(fixtures_dir)
+    imported = 0
+    for root, _, files in os.walk(cache_dir):
+        for file_name in files:
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(root, file_name), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get('page_type') not in PAGE_TYPES:
+                continue
+            html = cache._read_html(meta['url'])
+            if not html:
+                continue
+            _save(fixtures_dir, index, meta['page_type'], file_name[:-len('.json')],
+                  urlparse(meta['url']).path, html)
+            imported += 1
+    _write_index(fixtures_dir, index)
+    logger.info(f"Импортировано {imported} страниц из {cache_dir} в {fixtures_dir}")
+    return imported
+
+
+# ---- Синтетические страницы ----------------------------------------------------
+# Повторяют разметку, которую читают парсеры, и примерно вес настоящих страниц
+# (навигация, скрипты, реклама), чтобы замеры lxml/SoupStrainer были показательны.
+
+_STAT_ROWS = (
+    ('Rating 2.0', '{:.2f}', 0.8, 1.4),
+    ('K/D Ratio', '{:.2f}', 0.8, 1.5),
+    ('Damage / Round', '{:.1f}', 60, 95),
+    ('Kills / Round', '{:.2f}', 0.55, 0.9),
+    ('Assists / Round', '{:.2f}', 0.08, 0.2),
+    ('Deaths / Round', '{:.2f}', 0.55, 0.75),
+    ('Maps played', '{:.0f}', 20, 120),
+)
+
+
+def _filler(rng: random.Random, kilobytes: int) -> str:
+    """Разметка, которую парсеры не читают: меню, скрипты, рекламные блоки"""
+    parts = []
+    size = 0
+    while size < kilobytes * 1024:
+        kind = rng.randrange(3)
+        if kind == 0:
+            block = '<div class="navbar"><ul>' + ''.join(
+                f'<li><a href="/news/{rng.randrange(10 ** 5)}/item">News item {i}</a></li>' for i in range(20)
+            ) + '</ul></div>'
+        elif kind == 1:
+            block = '<script>window.__data=' + json.dumps({'k': [rng.random() for _ in range(40)]}) + ';</script>'
+        else:
+            block = ('<div class="ad-slot"><img src="https://img-cdn.hltv.org/ad.png" alt="">'
+                     '<span>' + 'lorem ipsum ' * 30 + '</span></div>')
+        parts.append(block)
+        size += len(block)
+    return ''.join(parts)
+
+
+def _page(title: str, body: str, rng: random.Random, filler_kb: int) -> str:
+    return (
+        f'<!DOCTYPE html><html><head><title>{title} | HLTV.org</title>'
+        f'{_filler(rng, filler_kb // 4)}</head><body>'
+        f'{_filler(rng, filler_kb // 4)}<div class="contentCol">{body}</div>'
+        f'{_filler(rng, filler_kb // 2)}</body></html>'
+    )
+
+
+def synthetic_ranking(rng: random.Random, teams: int = 30, filler_kb: int = 250) -> str:
+    rows = []
+    player_id = 1000
+    for rank in range(1, teams + 1):
+        players = []
+        for _ in range(5):
+            player_id += 1
+            players.append(
+                f'<td class="player-holder"><a href="/player/{player_id}/player{player_id}" class="pointer">'
+                f'<img class="playerPicture" src="https://img-cdn.hltv.org/p/{player_id}.png">'
+                f'<div class="nick">player{player_id}</div></a></td>'
+            )
+        team_id = 5000 + rank
+        rows.append(
+            f'<div class="ranked-team standard-box"><div class="ranking-header">'
+            f'<span class="position">#{rank}</span><div class="relative">'
+            f'<span class="name">Team {rank}</span><span class="points">({1000 - rank * 20} points)</span>'
+            f'</div></div><div class="lineup-con"><table class="lineup"><tr>{"".join(players)}</tr></table></div>'
+            f'<div class="more"><a href="/team/{team_id}/team{rank}" class="moreLink">HLTV Team profile</a></div></div>'
+        )
+    return _page('CS2 Ranking', ''.join(rows), rng, filler_kb)
+
+
+def synthetic_player(rng: random.Random, player_id: int, filler_kb: int = 150) -> str:
+    stats = ''.join(
+        f'<div class="stats-row"><span>{name}</span><span>{fmt.format(rng.uniform(low, high))}</span></div>'
+        for name, fmt, low, high in _STAT_ROWS
+    )
+    body = (
+        f'<h1 class="summaryNickname text-ellipsis">player{player_id}</h1>'
+        f'<div class="summaryRealname text-ellipsis">Real Name {player_id}</div>'
+        f'<div class="summaryStatBreakdownRow"><div class="summaryStatBreakdownDataPoint">Impact</div>'
+        f'<div class="summaryStatBreakdownDataValue">{rng.uniform(0.8, 1.4):.2f}</div></div>'
+        f'<div class="statistics">{stats}</div>'
+    )
+    return _page(f'player{player_id} Stats', body, rng, filler_kb)
+
+
+def _stats_table(rng: random.Random, player_ids: Iterable[int]) -> str:
+    """Таблица player-ratings-table (общая для /stats/players и /stats/teams/players)"""
+    rows = []
+    for player_id in player_ids:
+        i = player_id - 1001
+        maps = rng.randint(5, 150)
+        kills = rng.randint(400, 4000)
+        deaths = rng.randint(400, 4000)
+        rows.append(
+            f'<tr><td class="playerCol"><img class="flag" alt="Country" src="/img/flag.gif">'
+            f'<a href="/stats/players/{player_id}/player{player_id}">player{player_id}</a></td>'
+            f'<td class="teamCol"><a href="/stats/teams/{5000 + i // 5 + 1}/team"><img class="logo" alt="Team"></a></td>'
+            f'<td class="statsDetail">{maps}</td><td class="statsDetail gtSmartphone-only">{maps * 25}</td>'
+            f'<td class="kdDiffCol {"won" if kills >= deaths else "lost"}">{kills - deaths:+d}</td>'
+            f'<td class="statsDetail">{kills / deaths:.2f}</td>'
+            f'<td class="ratingCol">{rng.uniform(0.7, 1.4):.2f}</td></tr>'
+        )
+    return (
+        '<table class="stats-table player-ratings-table"><thead><tr>'
+        '<th class="playerCol">Player</th><th class="teamCol">Teams</th><th class="statsDetail">Maps</th>'
+        '<th class="statsDetail gtSmartphone-only">Rounds</th><th class="kdDiffCol">K-D Diff</th>'
+        '<th class="statsDetail">K/D</th><th class="ratingCol">Rating<span class="ratingDesc">2.0</span></th>'
+        f'</tr></thead><tbody>{"".join(rows)}</tbody></table>'
+    )
+
+
+def synthetic_stats_listing(rng: random.Random, players: int = 600, filler_kb: int = 200) -> str:
+    """Список /stats/players: игроки синтетического рейтинга (id с 1001) и прочие"""
+    return _page('CS2 Player Stats', _stats_table(rng, range(1001, 1001 + players)), rng, filler_kb)
+
+
+def synthetic_team_stats(rng: random.Random, rank: int, filler_kb: int = 150) -> str:
+    """Статистика игроков команды /stats/teams/players: пятерка команды rank синтетического рейтинга"""
+    first = 1001 + (rank - 1) * 5
+    return _page(f'Team {rank} Player Stats', _stats_table(rng, range(first, first + 5)), rng, filler_kb)
+
+
+def synthetic_matches(rng: random.Random, matches: int = 120, filler_kb: int = 200) -> str:
+    start = datetime(2026, 1, 1, 12, 0)
+    cards = []
+    for i in range(matches):
+        match_id = 2_370_000 + i
+        unix_ms = int((start + timedelta(hours=i)).timestamp() * 1000)
+        bo = rng.choice((1, 3, 5))
+        card = (
+            f'<a href="/matches/{match_id}/team{i % 30 + 1}-vs-team{(i + 7) % 30 + 1}" class="match a-reset">'
+            f'<div class="match-time" data-unix="{unix_ms}">12:00</div>'
+            f'<div class="matchMeta">bo{bo}</div>'
+            f'<div class="match-team team1"><div class="matchTeamName text-ellipsis">Team {i % 30 + 1}</div></div>'
+            f'<div class="match-team team2"><div class="matchTeamName text-ellipsis">Team {(i + 7) % 30 + 1}</div></div>'
+            f'</a>'
+        )
+        if i % 10 == 9:
+            card = f'<div class="matches-chronologically-hide">{card}</div>'
+        cards.append(card)
+    body = f'<div class="matches-list-wrapper">{"".join(cards)}</div>'
+    return _page('CS2 Matches', body, rng, filler_kb)
+
+
+def synthetic_match(rng: random.Random, match_id: int, filler_kb: int = 200) -> str:
+    unix_ms = int(datetime(2026, 1, 1, 12, 0).timestamp() * 1000) + match_id
+    body = (
+        f'<div class="teamsBox"><div class="time" data-unix="{unix_ms}">12:00</div>'
+        f'<div class="date" data-unix="{unix_ms}">1st of January 2026</div></div>'
+        f'<div class="padding preformatted-text bestof">Best of {rng.choice((1, 3, 5))} (LAN)</div>'
+    )
+    return _page(f'Match {match_id}', body, rng, filler_kb)
+
+
+def synthesize(fixtures_dir: str = FIXTURES_DIR, page_types: Iterable[str] = PAGE_TYPES, players: int = 20,
+               teams: int = 10, matches: int = 10, seed: int = 42) -> None:
+    """
+    Сгенерировать детерминированный синтетический корпус для page_types.
+
+    У каждого типа страниц свой генератор случайных чисел от seed, поэтому страница
+    типа не зависит от того, какие еще типы генерируются, и совпадает между коммитами.
+    """
+    index = _read_index(fixtures_dir)
+    for page_type in page_types:
+        rng = random.Random(f"{seed}-{page_type}")
+        if page_type == 'ranking':
+            _save(fixtures_dir, index, 'ranking', 'synthetic-ranking', '/ranking/teams', synthetic_ranking(rng))
+        elif page_type == 'player':
+            for player_id in range(1001, 1001 + players):
+                _save(fixtures_dir, index, 'player', f'synthetic-player-{player_id}',
+                      f'/stats/players/{player_id}/player{player_id}', synthetic_player(rng, player_id))
+        elif page_type == 'stats':
+            _save(fixtures_dir, index, 'stats', 'synthetic-stats', '/stats/players', synthetic_stats_listing(rng))
+        elif page_type == 'team_stats':
+            for rank in range(1, teams + 1):
+                _save(fixtures_dir, index, 'team_stats', f'synthetic-team-stats-{5000 + rank}',
+                      f'/stats/teams/players/{5000 + rank}/team{rank}', synthetic_team_stats(rng, rank))
+        elif page_type == 'matches':
+            _save(fixtures_dir, index, 'matches', 'synthetic-matches', '/matches', synthetic_matches(rng))
+        elif page_type == 'match':
+            for match_id in range(2_370_000, 2_370_000 + matches):
+                _save(fixtures_dir, index, 'match', f'synthetic-match-{match_id}',
+                      f'/matches/{match_id}', synthetic_match(rng, match_id))
+
+    _write_index(fixtures_dir, index)
+    logger.info(f"Синтетический корпус ({', '.join(page_types)}) записан в {fixtures_dir}")
+
+
+def ensure_fixtures(fixtures_dir: str = FIXTURES_DIR) -> None:
+    """Досоздать синтетические страницы тех типов, которых в корпусе нет"""
+    missing = [page_type for page_type in PAGE_TYPES if not load(page_type, fixtures_dir)]
+    if missing:
+        synthesize(fixtures_dir, missing)
+
+
+def clear(fixtures_dir: str = FIXTURES_DIR) -> None:
+    """Удалить корпус"""
+    shutil.rmtree(fixtures_dir, ignore_errors=True)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Local HLTV stand-in for throughput and soak tests.
+
+Serves the pages from ``benchmarks/fixtures`` (see ``fixtures.py``) on the
+same URL paths as hltv.org, with configurable latency, error and throttling
+rates and simulated Cloudflare challenges. Point the parsers at it with the
+``HLTV_BASE_URL`` environment variable.
+
+Unknown ids are served a recorded page of the same type, so a full ranking run
+works against a small corpus. The challenge page mimics Cloudflare: it has the
+"Just a moment..." title, a 403 status and a script that sets ``cf_clearance``
+and reloads. A browser passes it; a plain HTTP client does not until it gets
+the browser's cookies.
+
+Examples::
+
+    python benchmarks/mock_hltv_server.py --latency 300 --jitter 200 --challenge-rate 1
+    HLTV_BASE_URL=http://127.0.0.1:8800 PAGE_CACHE_ENABLED=false python runners/team_parser_runner.py
+    curl http://127.0.0.1:8800/_mock/stats
+"""
+
+import os
+import re
+import sys
+import time
+import gzip
+import zlib
+import random
+import asyncio
+import secrets
+import argparse
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Ensure we can import from ../src and the service root regardless of the current working directory
+_CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+_SRC_PATH = os.path.join(_CURRENT_DIR, "..", "src")
+_SERVICE_ROOT = os.path.join(_CURRENT_DIR, "..")
+for _path in (_SRC_PATH, _SERVICE_ROOT, _CURRENT_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# pylint: disable=wrong-import-position
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+
+import fixtures  # type: ignore
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger("mock_hltv")
+
+# Тип страницы по пути URL (если точного пути нет в корпусе)
+_ROUTES = (
+    (re.compile(r'^/ranking/teams(/|$)'), 'ranking'),
+    (re.compile(r'^/stats/players/?$'), 'stats'),
+    (re.compile(r'^/stats/teams/players/\d+(/|$)'), 'team_stats'),
+    (re.compile(r'^/stats/players/\d+(/|$)'), 'player'),
+    (re.compile(r'^/matches/?$'), 'matches'),
+    (re.compile(r'^/matches/\d+(/|$)'), 'match'),
+)
+_MATCH_PATH = re.compile(r'^(/matches/\d+)/')
+
+_CHALLENGE_PAGE = """<!DOCTYPE html><html lang="en-US"><head><title>Just a moment...</title></head><body>
+<div id="challenge-body-text">Checking your browser before accessing www.hltv.org.</div>
+<script>window._cf_chl_opt={{cType: 'managed', cRay: '{ray}'}};
+setTimeout(function () {{
+  document.cookie = 'cf_clearance={token}; path=/; max-age={ttl}';
+  location.reload();
+}}, {delay_ms});</script>
+</body></html>"""
+
+_ROBOTS_TXT = "User-agent: *\nDisallow: /\n"
+
+
+class MockHltv:
+    """
+    Состояние заглушки: страницы корпуса в памяти, выданные cf_clearance и счетчики.
+
+    Вероятности (error_rate, throttle_rate, challenge_rate) задаются долей запросов
+    от 0 до 1. Проверка Cloudflare выдается только клиентам без действующей
+    cf_clearance; cookie живет clearance_ttl секунд.
+    """
+
+    def __init__(self, fixtures_dir: str = fixtures.FIXTURES_DIR, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0, throttle_rate: float = 0, challenge_rate: float = 0,
+                 challenge_delay: float = 3, clearance_ttl: int = 1800, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.challenge_rate = challenge_rate
+        self.challenge_delay = challenge_delay
+        self.clearance_ttl = clearance_ttl
+        self.rng = random.Random(seed)
+
+        self.pages: Dict[str, Tuple[str, bytes]] = {}          # путь URL -> (тип, HTML)
+        self.by_type: Dict[str, List[bytes]] = {t: [] for t in fixtures.PAGE_TYPES}
+        self._load(fixtures_dir)
+
+        self._lock = threading.Lock()
+        self._clearances: Dict[str, float] = {}                # cf_clearance -> истекает (monotonic)
+        self.reset_stats()
+
+    def _load(self, fixtures_dir: str) -> None:
+        fixtures.ensure_fixtures(fixtures_dir)
+        for path, file_path in fixtures.iter_index(fixtures_dir):
+            page_type = os.path.basename(os.path.dirname(file_path))
+            with gzip.open(file_path, 'rb') as f:
+                html = f.read()
+            self.pages[path] = (page_type, html)
+            if page_type in self.by_type:
+                self.by_type[page_type].append(html)
+        counts = ', '.join(f"{t}: {len(p)}" for t, p in self.by_type.items())
+        logger.info(f"Загружено {len(self.pages)} страниц из {fixtures_dir} ({counts})")
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.started = time.monotonic()
+            self.statuses: Counter = Counter()
+            self.page_types: Counter = Counter()
+            self.clearances_issued = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            total = sum(self.statuses.values())
+            return {
+                'uptime_seconds': round(elapsed, 1),
+                'requests': total,
+                'requests_per_sec': round(total / elapsed, 2) if elapsed else 0,
+                'by_status': dict(self.statuses),
+                'by_page_type': dict(self.page_types),
+                'clearances_issued': self.clearances_issued,
+                'active_clearances': sum(1 for e in self._clearances.values() if e > time.monotonic()),
+            }
+
+    def resolve(self, path: str) -> Optional[Tuple[str, bytes]]:
+        """Страница для пути: точное совпадение, затем страница того же типа (стабильно по пути)"""
+        page = self.pages.get(path)
+        if page:
+            return page
+        match = _MATCH_PATH.match(path)
+        if match and match.group(1) in self.pages:
+            return self.pages[match.group(1)]
+        for pattern, page_type in _ROUTES:
+            if pattern.match(path) and self.by_type[page_type]:
+                candidates = self.by_type[page_type]
+                return page_type, candidates[zlib.crc32(path.encode('utf-8')) % len(candidates)]
+        return None
+
+    def delay(self) -> float:
+        spread = self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(0.0, self.latency_ms + spread) / 1000
+
+    def roll(self, rate: float) -> bool:
+        return rate > 0 and self.rng.random() < rate
+
+    def has_clearance(self, token: Optional[str]) -> bool:
+        with self._lock:
+            expires = self._clearances.get(token or '')
+            return expires is not None and expires > time.monotonic()
+
+    def issue_clearance(self) -> str:
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            now = time.monotonic()
+            self._clearances = {t: e for t, e in self._clearances.items() if e > now}
+            self._clearances[token] = now + self.clearance_ttl
+            self.clearances_issued += 1
+        return token
+
+    def record(self, page_type: str, status: int) -> None:
+        with self._lock:
+            self.statuses[str(status)] += 1
+            self.page_types[page_type] += 1
+
+
+def create_app(mock: MockHltv) -> FastAPI:
+    app = FastAPI(title="HLTV mock", docs_url=None, redoc_url=None, openapi_url=None)
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+    @app.get('/_mock/stats')
+    def stats() -> Dict[str, Any]:
+        return mock.stats()
+
+    @app.post('/_mock/reset')
+    def reset() -> Dict[str, Any]:
+        mock.reset_stats()
+        return mock.stats()
+
+    @app.get('/robots.txt')
+    def robots() -> Response:
+        return Response(_ROBOTS_TXT, media_type='text/plain')
+
+    @app.get('/{path:path}')
+    async def page(path: str, request: Request) -> Response:
+        path = '/' + path
+        page = mock.resolve(path)
+        page_type = page[0] if page else 'unknown'
+
+        await asyncio.sleep(mock.delay())
+
+        if page is None:
+            mock.record(page_type, 404)
+            return Response('Not found', status_code=404, media_type='text/plain')
+
+        if not mock.has_clearance(request.cookies.get('cf_clearance')) and mock.roll(mock.challenge_rate):
+            mock.record(page_type, 403)
+            html = _CHALLENGE_PAGE.format(
+                token=mock.issue_clearance(), ttl=mock.clearance_ttl, ray=secrets.token_hex(8),
+                delay_ms=int(mock.challenge_delay * 1000),
+            )
+            return Response(html, status_code=403, media_type='text/html',
+                            headers={'cf-mitigated': 'challenge', 'Cache-Control': 'no-store'})
+
+        if mock.roll(mock.throttle_rate):
+            mock.record(page_type, 429)
+            return Response('Too Many Requests', status_code=429, media_type='text/plain',
+                            headers={'Retry-After': '10'})
+
+        if mock.roll(mock.error_rate):
+            status = mock.rng.choice((500, 502))
+            mock.record(page_type, status)
+            return Response('Internal Server Error', status_code=status, media_type='text/plain')
+
+        html = page[1]
+        etag = f'"{zlib.crc32(html):08x}"'
+        if request.headers.get('if-none-match') == etag:
+            mock.record(page_type, 304)
+            return Response(status_code=304, headers={'ETag': etag})
+
+        mock.record(page_type, 200)
+        return Response(html, media_type='text/html; charset=utf-8', headers={'ETag': etag})
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--fixtures-dir', default=fixtures.FIXTURES_DIR)
+    parser.add_argument('--latency', type=float, default=0, help='средняя задержка ответа, мс')
+    parser.add_argument('--jitter', type=float, default=0, help='разброс задержки ±мс')
+    parser.add_argument('--error-rate', type=float, default=0, help='доля ответов 500/502')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='доля ответов 429')
+    parser.add_argument('--challenge-rate', type=float, default=0,
+                        help='доля запросов без cf_clearance, получающих проверку Cloudflare')
+    parser.add_argument('--challenge-delay', type=float, default=3,
+                        help='через сколько секунд страница проверки выдает cf_clearance')
+    parser.add_argument('--clearance-ttl', type=int, default=1800, help='время жизни cf_clearance, с')
+    parser.add_argument('--seed', type=int, help='seed для повторяемой последовательности ошибок')
+    args = parser.parse_args()
+
+    mock = MockHltv(
+        fixtures_dir=args.fixtures_dir, latency_ms=args.latency, jitter_ms=args.jitter,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, challenge_rate=args.challenge_rate,
+        challenge_delay=args.challenge_delay, clearance_ttl=args.clearance_ttl, seed=args.seed,
+    )
+    logger.info(f"Заглушка HLTV: HLTV_BASE_URL=http://{args.host}:{args.port}")
+    uvicorn.run(create_app(mock), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Long-running scraper daemon.
+
+Keeps a warm Firefox pool, HTTP session and DB connection pool and runs the
+ranking, player and match jobs on their own intervals (``DAEMON_JOBS``).
+Job status, manual job runs and Prometheus metrics are served over HTTP on
+``METRICS_PORT``::
+
+    curl http://127.0.0.1:9108/status
+    curl -X POST http://127.0.0.1:9108/jobs/matches/run
+"""
+
+import sys
+import os
+import signal
+import logging
+
+# Ensure we can import from ../src regardless of the current working directory
+_CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+_SRC_PATH = os.path.join(_CURRENT_DIR, "..", "src")
+_SERVICE_ROOT = os.path.join(_CURRENT_DIR, "..")
+for _path in (_SRC_PATH, _SERVICE_ROOT):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# pylint: disable=wrong-import-position
+from config.settings import EVENTS_ENABLED  # type: ignore
+from metrics import start_metrics_server, log_run_summary  # type: ignore
+from scrape_daemon import ScrapeDaemon  # type: ignore
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger("runner.daemon")
+
+
+def main() -> None:
+    """Entry-point: run scheduled scraping jobs until SIGTERM/SIGINT."""
+    publisher = None
+    if EVENTS_ENABLED:
+        from events import EventPublisher  # type: ignore
+        publisher = EventPublisher().start()
+
+    try:
+        with ScrapeDaemon() as daemon:
+            def _shutdown(signum, _frame):
+                logger.info("Received signal %s, stopping running jobs at the next checkpoint", signum)
+                daemon.stop()
+
+            signal.signal(signal.SIGTERM, _shutdown)
+            signal.signal(signal.SIGINT, _shutdown)
+
+            start_metrics_server(routes=daemon.add_routes)
+            daemon.run()
+    finally:
+        if publisher is not None:
+            publisher.stop()
+        log_run_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,15 +15,17 @@ from contextlib import suppress
 # Ensure we can import from ../src regardless of the current working directory
 _CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 _SRC_PATH = os.path.join(_CURRENT_DIR, "..", "src")
-if _SRC_PATH not in sys.path:
-    sys.path.insert(0, _SRC_PATH)
+_SERVICE_ROOT = os.path.join(_CURRENT_DIR, "..")
+for _path in (_SRC_PATH, _SERVICE_ROOT):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
 
 # pylint: disable=wrong-import-position
+from config.settings import METRICS_ENABLED, EVENTS_ENABLED  # type: ignore
+from cookie_store import CookieStore  # type: ignore
+from metrics import start_metrics_server, log_run_summary  # type: ignore
 from match_parser import MatchParser  # type: ignore
-from selenium import webdriver  # type: ignore
-from selenium.webdriver.firefox.options import Options as FirefoxOptions  # type: ignore
-from selenium.webdriver.firefox.service import Service as FirefoxService  # type: ignore
-import geckodriver_autoinstaller  # type: ignore
+from webdriver_factory import create_stealth_driver  # type: ignore
 
 
 logging.basicConfig(
@@ -33,28 +35,21 @@ logging.basicConfig(
 logger = logging.getLogger("runner.match_parser")
 
 
-def _init_driver() -> webdriver.Firefox:
-    """Initialise a head-less Firefox driver ready for parsing."""
-    logger.info("Initialising head-less Firefox WebDriver …")
-
-    # Ensure the correct geckodriver binary is available
-    geckodriver_path = geckodriver_autoinstaller.install()
-
-    options = FirefoxOptions()
-    options.add_argument("--headless")
-
-    service = FirefoxService(executable_path=geckodriver_path)
-    driver = webdriver.Firefox(service=service, options=options)
-    driver.set_page_load_timeout(60)
-    return driver
-
-
 def main() -> None:
     """Entry-point: parse upcoming matches and optionally persist them."""
     driver = None
+    publisher = None
+    if METRICS_ENABLED:
+        start_metrics_server()
 
     try:
-        driver = _init_driver()
+        # Change events are written to the outbox together with the data and published in batches
+        if EVENTS_ENABLED:
+            from events import EventPublisher  # type: ignore
+            publisher = EventPublisher().start()
+
+        # Reuse Cloudflare clearance cookies saved by previous runs
+        driver = create_stealth_driver(cookies=CookieStore().load())
 
         # Instantiate the parser.  Set `dry_run=False` to write into DB.
         with MatchParser(driver, dry_run=True) as parser:
@@ -68,6 +63,10 @@ def main() -> None:
             if driver is not None:
                 driver.quit()
                 logger.info("WebDriver has been closed.")
+        with suppress(Exception):
+            if publisher is not None:
+                publisher.stop()
+        log_run_summary()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """Runner for parsing HLTV top teams ranking.
 
-Adds the sibling `src` directory to import local parser modules.
+Adds the sibling `src` directory to import local parser modules and the
+service root so that `config.settings` is importable.
 """
 
 import sys
@@ -11,9 +12,13 @@ import logging
 # Ensure we can import from ../src regardless of the current working directory
 _CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 _SRC_PATH = os.path.join(_CURRENT_DIR, "..", "src")
-if _SRC_PATH not in sys.path:
-    sys.path.insert(0, _SRC_PATH)
+_SERVICE_ROOT = os.path.join(_CURRENT_DIR, "..")
+for _path in (_SRC_PATH, _SERVICE_ROOT):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
 
+from config.settings import METRICS_ENABLED, EVENTS_ENABLED  # type: ignore
+from metrics import start_metrics_server, log_run_summary  # type: ignore
 from team_parser import TeamParser  # type: ignore
 
 logging.basicConfig(
@@ -25,9 +30,23 @@ logger = logging.getLogger("runner.team_parser")
 
 def main() -> None:
     """Entry-point for parsing the current HLTV top-team ranking."""
-    with TeamParser() as parser:
-        teams = parser.parse_team_ranking(max_teams=241)
-        logger.info("Parsed and saved %s teams from ranking", len(teams))
+    if METRICS_ENABLED:
+        start_metrics_server()
+
+    # Change events are written to the outbox together with the data and published in batches
+    publisher = None
+    if EVENTS_ENABLED:
+        from events import EventPublisher  # type: ignore
+        publisher = EventPublisher().start()
+
+    try:
+        with TeamParser() as parser:
+            teams = parser.parse_team_ranking(max_teams=241)
+            logger.info("Parsed and saved %s teams from ranking", len(teams))
+    finally:
+        if publisher is not None:
+            publisher.stop()
+        log_run_summary()
 
 
 if __name__ == "__main__":
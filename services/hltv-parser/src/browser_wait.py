@@ -0,0 +1,78 @@
+"""
+Explicit page readiness waits for Selenium
+Ожидание готовности страницы вместо фиксированных пауз после driver.get
+"""
+
+import time
+import logging
+import threading
+from typing import Optional
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.firefox.webdriver import WebDriver
+from selenium.webdriver.support.ui import WebDriverWait
+
+from config.settings import PAGE_READY_TIMEOUT, CLOUDFLARE_WAIT_TIMEOUT
+from metrics import CLOUDFLARE_CHALLENGES, CLOUDFLARE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Заголовки страницы-проверки Cloudflare
+CHALLENGE_TITLES = ('just a moment', 'checking your browser')
+
+# Проверка через JS, чтобы не попадать под implicitly_wait драйвера
+_READY_SCRIPT = (
+    "return document.readyState === 'complete'"
+    " && (!arguments[0] || document.querySelector(arguments[0]) !== null)"
+)
+
+
+def is_challenge_title(title: str) -> bool:
+    """Проверить, является ли заголовок заголовком проверки Cloudflare"""
+    title = title.lower()
+    return any(marker in title for marker in CHALLENGE_TITLES)
+
+
+def wait_until_ready(driver: WebDriver, selector: Optional[str], timeout: float = PAGE_READY_TIMEOUT) -> bool:
+    """
+    Дождаться загрузки документа и появления selector на странице.
+
+    Ожидание прерывается раньше, если браузер показал проверку Cloudflare —
+    ее обрабатывает вызывающий код.
+
+    Returns:
+        True, если страница готова; False при проверке Cloudflare или по таймауту.
+    """
+    def ready(d: WebDriver):
+        if is_challenge_title(d.title):
+            return 'challenge'
+        return d.execute_script(_READY_SCRIPT, selector) and 'ready'
+
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.25).until(ready) == 'ready'
+    except TimeoutException:
+        logger.warning(f"Страница не готова за {timeout} с (ожидали '{selector}')")
+        return False
+
+
+def wait_past_challenge(driver: WebDriver, timeout: float = CLOUDFLARE_WAIT_TIMEOUT,
+                        page_type: str = 'unknown', stop_event: Optional[threading.Event] = None) -> bool:
+    """
+    Дождаться, пока Cloudflare пропустит браузер. Возвращает True, если проверка пройдена.
+
+    Ожидание прерывается установкой stop_event (результат — False).
+    """
+    CLOUDFLARE_CHALLENGES.labels(page_type, 'browser').inc()
+    started = time.monotonic()
+
+    def passed(d: WebDriver):
+        if stop_event is not None and stop_event.is_set():
+            return 'stopped'
+        return not is_challenge_title(d.title) and 'passed'
+
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=1).until(passed) == 'passed'
+    except TimeoutException:
+        return False
+    finally:
+        CLOUDFLARE_WAIT_SECONDS.labels(page_type).observe(time.monotonic() - started)
@@ -0,0 +1,72 @@
+"""
+On-disk store for HLTV browser cookies
+Сохранение cookies (в том числе Cloudflare clearance) между запусками парсеров
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List
+
+from config.settings import COOKIE_STORE_ENABLED, COOKIE_STORE_PATH, COOKIE_SESSION_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+
+class CookieStore:
+    """
+    JSON файл с cookies браузера в формате Selenium (``driver.get_cookies()``).
+
+    Cookies сохраняются после каждой успешной загрузки страницы браузером и при
+    перезапуске драйвера, а загружаются в новые драйверы и HTTP сессию. Cookies с
+    истекшим ``expiry`` отбрасываются; сессионные cookies действуют
+    ``COOKIE_SESSION_MAX_AGE`` секунд с момента сохранения. Если хранение на диске
+    отключено, cookies живут только в памяти процесса.
+    """
+
+    def __init__(self, path: str = COOKIE_STORE_PATH, enabled: bool = COOKIE_STORE_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._memory: Dict[str, Any] = {}
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Действующие cookies из файла (пустой список, если их нет)"""
+        data = self._memory
+        if self.enabled:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+        now = time.time()
+        session_valid = now - data.get('saved_at', 0) < COOKIE_SESSION_MAX_AGE
+        cookies = [
+            cookie for cookie in data.get('cookies', [])
+            if (cookie['expiry'] > now if 'expiry' in cookie else session_valid)
+        ]
+        if cookies:
+            logger.info(f"Загружено {len(cookies)} сохраненных cookies HLTV")
+        return cookies
+
+    def save(self, cookies: List[Dict[str, Any]]) -> None:
+        """Сохранить cookies в файл (доступен только владельцу)"""
+        if not cookies:
+            return
+        data = {'saved_at': time.time(), 'cookies': cookies}
+        self._memory = data
+        if not self.enabled:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Не удалось сохранить cookies в {self.path}: {e}")
@@ -3,17 +3,26 @@ Database models and connection setup for HLTV Parser
 """
 
 import os
-from datetime import datetime
-from typing import Optional, List
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, Date, DECIMAL, CheckConstraint, Index
+import time
+import logging
+from datetime import datetime, date
+from typing import Optional, List, Dict, Any, Iterable, Callable, Set, Tuple
+from sqlalchemy import create_engine, insert, tuple_, Column, BigInteger, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, Date, DECIMAL, CheckConstraint, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
 from sqlalchemy.sql import func
 from dotenv import load_dotenv
 
+from config.settings import EVENTS_ENABLED, EVENT_ROUTING_KEYS
+import metrics
+
 # Загружаем переменные окружения
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 
 # Настройки подключения к БД
@@ -154,11 +163,31 @@ class PlayerStatistics(Base):
         CheckConstraint('kd_ratio >= 0', name='chk_kd_positive'),
         CheckConstraint('adr >= 0', name='chk_adr_positive'),
         CheckConstraint('maps_played >= 0', name='chk_maps_positive'),
+        UniqueConstraint('player_id', 'period_start', name='uq_player_stats_player_period'),
         Index('idx_player_stats_player_id', 'player_id'),
         Index('idx_player_stats_period', 'period_start', 'period_end'),
     )
 
 
+class EventOutbox(Base):
+    """События об изменениях данных, ожидающие публикации в RabbitMQ (см. events.EventPublisher)"""
+    __tablename__ = "event_outbox"
+
+    id = Column(BigInteger, primary_key=True)
+    event_type = Column(String(50), nullable=False, comment="match.created, team.ranking_changed и т.д.")
+    routing_key = Column(String(100), nullable=False, comment="Ключ маршрутизации RabbitMQ")
+    payload = Column(JSON, nullable=False, comment="Тело события")
+    attempts = Column(Integer, nullable=False, default=0, comment="Неудачных попыток публикации")
+    last_error = Column(Text, nullable=True, comment="Последняя ошибка публикации")
+    created_at = Column(DateTime, default=func.now())
+    published_at = Column(DateTime, nullable=True, comment="Время подтверждения брокером (NULL — не опубликовано)")
+
+    __table_args__ = (
+        Index('idx_event_outbox_unpublished', 'id', postgresql_where=published_at.is_(None)),
+        Index('idx_event_outbox_published_at', 'published_at'),
+    )
+
+
 def get_db() -> Session:
     """
     Получить сессию базы данных
@@ -174,4 +203,523 @@ def get_team_by_name(db: Session, team_name: str) -> Optional[Team]:
     """
     Найти команду по ее точному названию.
     """
-    return db.query(Team).filter(Team.name == team_name).first() 
\ No newline at end of file
+    return db.query(Team).filter(Team.name == team_name).first()
+
+
+def _normalize_team_name(name: str) -> str:
+    """Нормализовать название команды для сравнения: регистр и пробелы"""
+    return ' '.join(name.casefold().split())
+
+
+class TeamResolver:
+    """
+    Поиск команд по названию без обращений к БД.
+
+    Один раз загружает все активные команды (название, тег, hltv_id -> id) в словари;
+    сравнение названий и тегов нечувствительно к регистру, дополнительно поддерживаются
+    алиасы (альтернативное название -> каноническое). Обновляется вызовом refresh().
+
+    По тегу ищутся только настоящие теги: теги по умолчанию из первых букв названия
+    (``_default_team_tag``) не индексируются, а тег, общий для нескольких команд,
+    считается неоднозначным и не дает совпадения.
+    """
+
+    def __init__(self, db: Session, aliases: Optional[Dict[str, str]] = None):
+        self.db = db
+        self.aliases = {_normalize_team_name(k): _normalize_team_name(v) for k, v in (aliases or {}).items()}
+        self._by_name: Dict[str, int] = {}
+        self._by_tag: Dict[str, Optional[int]] = {}
+        self._by_hltv_id: Dict[int, int] = {}
+        self.loaded = False
+
+    def refresh(self) -> None:
+        """Перечитать активные команды из БД"""
+        rows = self.db.query(Team.id, Team.name, Team.tag, Team.hltv_id).filter(Team.is_active.is_(True)).all()
+        self._by_name, self._by_tag, self._by_hltv_id = {}, {}, {}
+        for team_id, name, tag, hltv_id in rows:
+            self._by_name[_normalize_team_name(name)] = team_id
+            if tag and tag != _default_team_tag(name):
+                # Теги не уникальны: общий для нескольких команд тег неоднозначен (None)
+                tag_key = _normalize_team_name(tag)
+                self._by_tag[tag_key] = team_id if self._by_tag.get(tag_key, team_id) == team_id else None
+            self._by_hltv_id[hltv_id] = team_id
+        self.loaded = True
+        logger.info(f"Загружено {len(rows)} активных команд для сопоставления по названию")
+
+    def resolve(self, team_name: str) -> Optional[int]:
+        """Найти teams.id по названию, алиасу или тегу"""
+        if not self.loaded:
+            self.refresh()
+        key = _normalize_team_name(team_name)
+        key = self.aliases.get(key, key)
+        team_id = self._by_name.get(key)
+        if team_id is None:
+            team_id = self._by_tag.get(key)
+            if team_id is None and key in self._by_tag:
+                logger.info(f"Тег '{team_name}' есть у нескольких команд, команда не определена")
+        return team_id
+
+    def by_hltv_id(self, hltv_id: int) -> Optional[int]:
+        """Найти teams.id по ID команды на HLTV"""
+        if not self.loaded:
+            self.refresh()
+        return self._by_hltv_id.get(hltv_id)
+
+
+def _default_team_tag(name: str) -> str:
+    """Тег команды по умолчанию (до 10 символов) — первые буквы слов"""
+    return ''.join([w[0] for w in name.split()][:4]).upper()[:10]
+
+
+def upsert_players(db: Session, players: Iterable[Dict[str, Any]]) -> Dict[int, int]:
+    """
+    Вставить или обновить игроков одним INSERT ... ON CONFLICT (hltv_id).
+
+    Returns:
+        Соответствие hltv_id -> players.id
+    """
+    rows = {
+        p['hltv_id']: {
+            'hltv_id': p['hltv_id'],
+            'nickname': p['nickname'],
+            'real_name': p.get('real_name'),
+            'hltv_url': p.get('hltv_url'),
+            'is_active': True,
+        }
+        for p in players
+    }
+    if not rows:
+        return {}
+
+    stmt = pg_insert(Player).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Player.hltv_id],
+        set_={
+            'nickname': stmt.excluded.nickname,
+            # Пустое имя (например, из списка статистики) не затирает сохраненное
+            'real_name': func.coalesce(func.nullif(stmt.excluded.real_name, ''), Player.real_name),
+            'hltv_url': stmt.excluded.hltv_url,
+            'is_active': True,
+            'updated_at': func.now(),
+        },
+    ).returning(Player.hltv_id, Player.id)
+    return {hltv_id: player_id for hltv_id, player_id in db.execute(stmt)}
+
+
+# Поле статистики PlayerParser -> столбец player_statistics
+STATISTICS_COLUMNS = {
+    'rating_2_0': 'rating_2_0',
+    'kd_ratio': 'kd_ratio',
+    'adr': 'adr',
+    'kpr': 'kills_per_round',
+    'apr': 'assists_per_round',
+    'dpr': 'deaths_per_round',
+    'maps_played': 'maps_played',
+}
+
+
+def upsert_player_statistics(db: Session, stats_by_player: Dict[int, Dict[str, Any]]) -> None:
+    """
+    Вставить или обновить статистику за текущий месяц одним
+    INSERT ... ON CONFLICT (player_id, period_start).
+
+    Показатели, которых нет в новых данных (None, для maps_played — 0), сохраняют
+    прежние значения: список /stats/players несет только часть полей страницы игрока.
+
+    Args:
+        stats_by_player: players.id -> словарь статистики из PlayerParser
+    """
+    if not stats_by_player:
+        return
+
+    today = date.today()
+    period_start = today.replace(day=1)
+    now = datetime.now()
+    rows = [
+        {
+            'player_id': player_id,
+            'rating_2_0': stats.get('rating_2_0'),
+            'kd_ratio': stats.get('kd_ratio'),
+            'adr': stats.get('adr'),
+            'kills_per_round': stats.get('kpr'),
+            'assists_per_round': stats.get('apr'),
+            'deaths_per_round': stats.get('dpr'),
+            'maps_played': stats.get('maps_played', 0),
+            'period_start': period_start,
+            'period_end': today,
+            'last_updated': now,
+        }
+        for player_id, stats in stats_by_player.items()
+    ]
+
+    stmt = pg_insert(PlayerStatistics).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PlayerStatistics.player_id, PlayerStatistics.period_start],
+        set_={
+            **{
+                column: func.coalesce(getattr(stmt.excluded, column), getattr(PlayerStatistics, column))
+                for column in STATISTICS_COLUMNS.values()
+                if column != 'maps_played'
+            },
+            'maps_played': func.coalesce(func.nullif(stmt.excluded.maps_played, 0), PlayerStatistics.maps_played),
+            'last_updated': stmt.excluded.last_updated,
+            'updated_at': func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def find_players_missing_statistics(db: Session, hltv_ids: Iterable[int], fields: Iterable[str]) -> Set[int]:
+    """
+    Игроки, у которых за текущий месяц нет статистики или не заполнено одно из fields.
+
+    Args:
+        hltv_ids: hltv_id проверяемых игроков.
+        fields: поля статистики PlayerParser (ключи STATISTICS_COLUMNS).
+
+    Returns:
+        Множество hltv_id.
+    """
+    hltv_ids = set(hltv_ids)
+    columns = [getattr(PlayerStatistics, STATISTICS_COLUMNS[field]) for field in fields]
+    if not hltv_ids or not columns:
+        return set()
+
+    complete = {
+        hltv_id for (hltv_id,) in
+        db.query(Player.hltv_id)
+        .join(PlayerStatistics, PlayerStatistics.player_id == Player.id)
+        .filter(
+            Player.hltv_id.in_(list(hltv_ids)),
+            PlayerStatistics.period_start == date.today().replace(day=1),
+            *[column.isnot(None) for column in columns],
+        )
+        .all()
+    }
+    return hltv_ids - complete
+
+
+def record_events(db: Session, events: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+    """
+    Записать события (тип, тело) в event_outbox без commit — в транзакции вызывающего кода,
+    вместе с изменением, о котором они сообщают. При EVENTS_ENABLED=false ничего не делает.
+
+    Returns:
+        Количество записанных событий.
+    """
+    if not EVENTS_ENABLED:
+        return 0
+    rows = [
+        {
+            'event_type': event_type,
+            'routing_key': EVENT_ROUTING_KEYS[event_type],
+            'payload': {'event': event_type, 'occurred_at': datetime.now().isoformat(timespec='seconds'), **payload},
+            'attempts': 0,
+        }
+        for event_type, payload in events
+    ]
+    if rows:
+        db.execute(insert(EventOutbox), rows)
+    return len(rows)
+
+
+def upsert_teams(db: Session, teams: Iterable[Dict[str, Any]]) -> Dict[int, int]:
+    """
+    Вставить или обновить команды одним INSERT ... ON CONFLICT (hltv_id).
+    Существующий непустой тег команды не перезаписывается.
+
+    Returns:
+        Соответствие hltv_id -> teams.id
+    """
+    rows = {
+        t['hltv_id']: {
+            'hltv_id': t['hltv_id'],
+            'name': t['name'],
+            'world_ranking': t.get('rank') or 0,
+            'points': t.get('points') or 0,
+            'hltv_url': t.get('hltv_url'),
+            'tag': _default_team_tag(t['name']),
+            'is_active': True,
+        }
+        for t in teams
+    }
+    if not rows:
+        return {}
+
+    stmt = pg_insert(Team).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Team.hltv_id],
+        set_={
+            'name': stmt.excluded.name,
+            'world_ranking': stmt.excluded.world_ranking,
+            'points': stmt.excluded.points,
+            'hltv_url': stmt.excluded.hltv_url,
+            'tag': func.coalesce(func.nullif(Team.tag, ''), stmt.excluded.tag),
+            'updated_at': func.now(),
+        },
+    ).returning(Team.hltv_id, Team.id)
+    return {hltv_id: team_id for hltv_id, team_id in db.execute(stmt)}
+
+
+def resolve_player_ids(db: Session, hltv_ids: Iterable[int]) -> Dict[int, int]:
+    """Найти players.id по hltv_id одним запросом WHERE hltv_id IN (...)"""
+    hltv_ids = set(hltv_ids)
+    if not hltv_ids:
+        return {}
+    rows = db.query(Player.hltv_id, Player.id).filter(Player.hltv_id.in_(list(hltv_ids))).all()
+    return {hltv_id: player_id for hltv_id, player_id in rows}
+
+
+def sync_team_rosters(db: Session, rosters: Dict[int, List[int]]) -> Dict[int, Tuple[List[int], List[int]]]:
+    """
+    Синхронизировать активные составы команд с распарсенными (без commit).
+
+    Вместо удаления и повторной вставки всего состава считает разницу между текущим
+    активным составом и новым: ушедшим игрокам проставляется left_at, новые
+    добавляются. У оставшихся игроков сохраняется исходный joined_at.
+
+    Args:
+        rosters: teams.id -> список players.id текущего состава
+
+    Returns:
+        teams.id -> (пришедшие players.id, ушедшие players.id) для команд, состав которых изменился
+    """
+    if not rosters:
+        return {}
+
+    current = set(
+        db.query(TeamRoster.team_id, TeamRoster.player_id).filter(
+            TeamRoster.team_id.in_(list(rosters)),
+            TeamRoster.left_at.is_(None)
+        ).all()
+    )
+    parsed = {(team_id, player_id) for team_id, player_ids in rosters.items() for player_id in player_ids}
+
+    now = datetime.now()
+    leavers = current - parsed
+    joiners = parsed - current
+
+    if leavers:
+        db.query(TeamRoster).filter(
+            tuple_(TeamRoster.team_id, TeamRoster.player_id).in_(list(leavers)),
+            TeamRoster.left_at.is_(None)
+        ).update({'left_at': now, 'is_active': False, 'updated_at': now}, synchronize_session=False)
+
+    if joiners:
+        db.execute(insert(TeamRoster), [
+            {
+                'team_id': team_id,
+                'player_id': player_id,
+                'role': 'Player',  # Базовая роль
+                'joined_at': now,
+                'is_active': True,
+            }
+            for team_id, player_id in joiners
+        ])
+
+    logger.info(f"Составы {len(rosters)} команд синхронизированы: +{len(joiners)} / -{len(leavers)} игроков")
+
+    changes: Dict[int, Tuple[List[int], List[int]]] = {}
+    for team_id, player_id in joiners:
+        changes.setdefault(team_id, ([], []))[0].append(player_id)
+    for team_id, player_id in leavers:
+        changes.setdefault(team_id, ([], []))[1].append(player_id)
+    return changes
+
+
+class BatchWriter:
+    """
+    Пакетная запись результатов парсинга.
+
+    Накапливает команды, игроков и их статистику и сбрасывает их в БД
+    INSERT ... ON CONFLICT запросами — одна транзакция на пакет.
+
+    ``on_flush(team_hltv_ids, player_hltv_ids)`` вызывается после каждого
+    успешного коммита пакета (например, чтобы отметить прогресс прогона).
+
+    Строки без hltv_id в пакет не попадают. Если пакет отклонен из-за данных
+    (IntegrityError, DataError), он записывается заново по одной команде (с ее
+    игроками) и по одному игроку, чтобы одна плохая строка не отменяла остальные;
+    незаписанные строки считаются в ``failed_rows``, а сам пакет — в ``failed_batches``.
+
+    При EVENTS_ENABLED в той же транзакции в event_outbox пишутся события
+    player.created, team.ranking_changed и team.roster_changed — только для
+    действительно изменившихся данных.
+    """
+
+    def __init__(self, db: Session, batch_size: int = 200,
+                 on_flush: Optional[Callable[[List[int], List[int]], None]] = None):
+        self.db = db
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self._players: Dict[int, Dict[str, Any]] = {}
+        self._teams: Dict[int, Dict[str, Any]] = {}
+        self.teams_written = 0
+        self.players_written = 0
+        self.failed_batches = 0
+        self.failed_rows = 0
+
+    def add_player(self, player_data: Dict[str, Any]) -> None:
+        """Добавить игрока (вместе со статистикой) в пакет"""
+        if player_data.get('hltv_id') is None:
+            logger.warning(f"Игрок {player_data.get('nickname', 'Unknown')} без hltv_id пропущен")
+            return
+        self._players[player_data['hltv_id']] = player_data
+        self._maybe_flush()
+
+    def add_team(self, team_data: Dict[str, Any]) -> None:
+        """Добавить команду (и ее состав из team_data['players']) в пакет"""
+        if team_data.get('hltv_id') is None:
+            logger.warning(f"Команда {team_data.get('name', 'Unknown')} без hltv_id пропущена")
+            return
+        for player_data in team_data.get('players', []):
+            if player_data.get('hltv_id') is None:
+                logger.warning(f"Игрок {player_data.get('nickname', 'Unknown')} без hltv_id пропущен")
+                continue
+            self._players[player_data['hltv_id']] = player_data
+        self._teams[team_data['hltv_id']] = team_data
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self._players) + len(self._teams) >= self.batch_size:
+            self.flush()
+
+    @staticmethod
+    def _change_events(players: Dict[int, Dict[str, Any]], teams: Dict[int, Dict[str, Any]],
+                       team_ids: Dict[int, int], known_players: Set[int],
+                       previous_teams: Dict[int, Tuple[Optional[int], Optional[int]]],
+                       roster_changes: Dict[int, Tuple[List[int], List[int]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """События об изменениях в пакете: новые игроки, сдвиги в рейтинге и смены составов"""
+        events: List[Tuple[str, Dict[str, Any]]] = [
+            ('player.created', {'hltv_id': hltv_id, 'nickname': p['nickname'], 'hltv_url': p.get('hltv_url')})
+            for hltv_id, p in players.items()
+            if hltv_id not in known_players
+        ]
+        hltv_by_team_id = {team_id: hltv_id for hltv_id, team_id in team_ids.items()}
+        for hltv_id, team_data in teams.items():
+            previous_rank, previous_points = previous_teams.get(hltv_id, (None, None))
+            rank = team_data.get('rank') or 0
+            if previous_rank != rank:
+                events.append(('team.ranking_changed', {
+                    'hltv_id': hltv_id,
+                    'team_id': team_ids.get(hltv_id),
+                    'name': team_data['name'],
+                    'previous_rank': previous_rank,
+                    'rank': rank,
+                    'previous_points': previous_points,
+                    'points': team_data.get('points') or 0,
+                }))
+        for team_id, (joined, left) in roster_changes.items():
+            events.append(('team.roster_changed', {
+                'hltv_id': hltv_by_team_id.get(team_id),
+                'team_id': team_id,
+                'joined_player_ids': sorted(joined),
+                'left_player_ids': sorted(left),
+            }))
+        return events
+
+    def flush(self) -> bool:
+        """Записать накопленный пакет в одной транзакции"""
+        if not self._players and not self._teams:
+            return True
+
+        players, teams = self._players, self._teams
+        self._players, self._teams = {}, {}
+        try:
+            self._write(players, teams)
+            return True
+        except (IntegrityError, DataError) as e:
+            self.db.rollback()
+            logger.warning(f"Пакет ({len(teams)} команд, {len(players)} игроков) отклонен: {e}. Записываем по одной строке")
+            return self._write_rows(players, teams)
+        except Exception as e:
+            logger.error(f"Ошибка при пакетной записи ({len(teams)} команд, {len(players)} игроков): {e}")
+            self.db.rollback()
+            self.failed_batches += 1
+            metrics.DB_WRITE_ERRORS.labels('batch').inc()
+            return False
+
+    def _write_rows(self, players: Dict[int, Dict[str, Any]], teams: Dict[int, Dict[str, Any]]) -> bool:
+        """Записать пакет по одной команде (с ее игроками) и по одному оставшемуся игроку"""
+        units = []
+        remaining = dict(players)
+        for hltv_id, team_data in teams.items():
+            team_players = {
+                p['hltv_id']: remaining.pop(p['hltv_id'])
+                for p in team_data.get('players', []) if p.get('hltv_id') in remaining
+            }
+            units.append((team_players, {hltv_id: team_data}))
+        units.extend(({hltv_id: player_data}, {}) for hltv_id, player_data in remaining.items())
+
+        ok = True
+        for unit_players, unit_teams in units:
+            try:
+                self._write(unit_players, unit_teams)
+            except Exception as e:
+                self.db.rollback()
+                self.failed_rows += 1
+                metrics.DB_WRITE_ERRORS.labels('row').inc()
+                ok = False
+                names = [t.get('name') for t in unit_teams.values()] or [p.get('nickname') for p in unit_players.values()]
+                logger.error(f"Не удалось записать {', '.join(map(str, names))}: {e}")
+        if not ok:
+            self.failed_batches += 1
+            metrics.DB_WRITE_ERRORS.labels('batch').inc()
+        return ok
+
+    def _write(self, players: Dict[int, Dict[str, Any]], teams: Dict[int, Dict[str, Any]]) -> None:
+        """Записать команды и игроков одной транзакцией (исключение — после rollback вызывающим)"""
+        started = time.monotonic()
+        # Прежнее состояние нужно только для событий об изменениях
+        known_players: Set[int] = set()
+        previous_teams: Dict[int, Tuple[Optional[int], Optional[int]]] = {}
+        if EVENTS_ENABLED:
+            known_players = set(resolve_player_ids(self.db, players))
+            if teams:
+                previous_teams = {
+                    hltv_id: (rank, points) for hltv_id, rank, points in
+                    self.db.query(Team.hltv_id, Team.world_ranking, Team.points)
+                    .filter(Team.hltv_id.in_(list(teams))).all()
+                }
+
+        player_ids = upsert_players(self.db, players.values())
+        stats = {
+            player_ids[hltv_id]: p['statistics']
+            for hltv_id, p in players.items()
+            if p.get('statistics') and hltv_id in player_ids
+        }
+        upsert_player_statistics(self.db, stats)
+
+        team_ids = upsert_teams(self.db, teams.values())
+
+        # Состав берем со страницы рейтинга (roster), а не только из успешно
+        # распарсенных игроков, чтобы ошибка загрузки не считалась уходом игрока
+        roster_hltv_ids = {
+            hltv_id: team_data['roster'] if 'roster' in team_data else [
+                p['hltv_id'] for p in team_data.get('players', []) if p.get('hltv_id') is not None
+            ]
+            for hltv_id, team_data in teams.items()
+        }
+        missing = {pid for ids in roster_hltv_ids.values() for pid in ids} - player_ids.keys()
+        player_ids.update(resolve_player_ids(self.db, missing))
+        roster_changes = sync_team_rosters(self.db, {
+            team_ids[hltv_id]: [player_ids[pid] for pid in ids if pid in player_ids]
+            for hltv_id, ids in roster_hltv_ids.items()
+            if ids
+        })
+
+        if EVENTS_ENABLED:
+            record_events(self.db, self._change_events(players, teams, team_ids, known_players,
+                                                       previous_teams, roster_changes))
+
+        self.db.commit()
+        metrics.observe_db_write('batch', time.monotonic() - started, {
+            'players': len(players),
+            'player_statistics': len(stats),
+            'teams': len(teams),
+        })
+        self.teams_written += len(teams)
+        self.players_written += len(players)
+        logger.info(f"Записан пакет: {len(teams)} команд, {len(players)} игроков")
+        if self.on_flush:
+            self.on_flush(list(teams), list(players))
@@ -0,0 +1,176 @@
+"""
+Pool of warm WebDriver instances
+Пул заранее запущенных Firefox драйверов для параллельного парсинга
+"""
+
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from config.settings import DRIVER_MAX_PAGES, DRIVER_MAX_RSS_MB
+from cookie_store import CookieStore
+from webdriver_factory import create_stealth_driver, inject_cookies, browser_rss_mb
+
+logger = logging.getLogger(__name__)
+
+
+class DriverPool:
+    """
+    Пул из N headless Firefox драйверов за общей очередью задач.
+
+    Задачи выполняются в пуле потоков размером с количество драйверов; каждая
+    задача берет свободный драйвер из очереди и возвращает его по завершении.
+
+    Пул отвечает за весь жизненный цикл драйверов: перед выдачей драйвер
+    проверяется (упавший Firefox заменяется новым), а после ``max_pages``
+    загруженных страниц или при росте памяти браузера выше ``max_rss_mb``
+    перезапускается. Cookies перезапускаемого драйвера (включая cf_clearance)
+    сохраняются в ``cookie_store`` и добавляются в каждый новый драйвер, в том
+    числе в драйверы следующего запуска, чтобы не проходить проверку Cloudflare заново.
+    Пустой слот (None в очереди) означает, что драйвер нужно создать при
+    следующей выдаче.
+    """
+
+    def __init__(self, size: int, driver_factory: Callable[[], WebDriver] = create_stealth_driver,
+                 max_pages: int = DRIVER_MAX_PAGES, max_rss_mb: int = DRIVER_MAX_RSS_MB,
+                 cookie_store: Optional[CookieStore] = None):
+        self.size = max(1, size)
+        self.driver_factory = driver_factory
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.cookie_store = cookie_store or CookieStore()
+        self.recycled = 0
+        self._lock = threading.Lock()
+        self._drivers: List[WebDriver] = []
+        self._idle: "queue.Queue[Optional[WebDriver]]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        logger.info(f"Запускаем пул из {self.size} драйверов...")
+        try:
+            for _ in range(self.size):
+                self._idle.put(self._create())
+        except Exception:
+            self.close()
+            raise
+
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="hltv-driver")
+
+    def _create(self) -> WebDriver:
+        driver = self.driver_factory()
+        with self._lock:
+            self._drivers.append(driver)
+        cookies = self.cookie_store.load()
+        if cookies:
+            try:
+                inject_cookies(driver, cookies)
+            except Exception as e:
+                logger.warning(f"Не удалось перенести cookies в новый драйвер: {e}")
+        return driver
+
+    def _discard(self, driver: WebDriver) -> None:
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии драйвера: {e}")
+
+    @staticmethod
+    def _is_healthy(driver: WebDriver) -> bool:
+        """Отвечает ли браузер на команды"""
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self) -> WebDriver:
+        driver = self._idle.get()
+        if driver is not None and not self._is_healthy(driver):
+            logger.warning("Драйвер не отвечает, запускаем новый")
+            self._discard(driver)
+            driver = None
+        if driver is None:
+            try:
+                driver = self._create()
+            except Exception:
+                self._idle.put(None)
+                raise
+        return driver
+
+    def _recycle_reason(self, driver: WebDriver) -> Optional[str]:
+        pages = getattr(driver, 'pages_loaded', 0)
+        if self.max_pages and pages >= self.max_pages:
+            return f"загружено {pages} страниц"
+        if self.max_rss_mb:
+            try:
+                rss = browser_rss_mb(driver)
+            except Exception:
+                rss = None
+            if rss is not None and rss > self.max_rss_mb:
+                return f"память браузера {rss:.0f} МБ"
+        return None
+
+    def _checkin(self, driver: WebDriver) -> None:
+        reason = self._recycle_reason(driver)
+        if reason:
+            logger.info(f"Перезапускаем драйвер: {reason}")
+            try:
+                self.cookie_store.save(driver.get_cookies())
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить cookies драйвера: {e}")
+            self._discard(driver)
+            self.recycled += 1
+            driver = None
+        self._idle.put(driver)
+
+    @contextmanager
+    def driver(self) -> Iterator[WebDriver]:
+        """Взять свободный драйвер из пула на время блока with"""
+        driver = self._checkout()
+        try:
+            yield driver
+        finally:
+            self._checkin(driver)
+
+    def submit(self, func: Callable[..., object], *args, **kwargs) -> Future:
+        """
+        Поставить задачу в очередь пула.
+
+        ``func`` вызывается как ``func(driver, *args, **kwargs)`` со свободным драйвером.
+        """
+        def _run():
+            with self.driver() as driver:
+                return func(driver, *args, **kwargs)
+
+        return self._executor.submit(_run)
+
+    def close(self, wait: bool = True):
+        """
+        Остановить воркеры и закрыть все драйверы.
+
+        wait=False — не ждать выполняющиеся задачи (остановка по таймауту): их драйверы
+        закрываются, и задачи завершаются ошибкой WebDriver.
+        """
+        if self._executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.warning(f"Ошибка при закрытии драйвера: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
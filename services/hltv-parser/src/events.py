@@ -0,0 +1,368 @@
+"""
+Change events publisher for HLTV Parser
+Публикация событий из event_outbox в RabbitMQ пакетами с асинхронными подтверждениями брокера
+"""
+
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import pika
+from pika import spec
+from pika.exceptions import AMQPConnectionError, AMQPError
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from config.settings import (
+    RABBITMQ_URL, EVENTS_EXCHANGE, EVENTS_BATCH_SIZE, EVENTS_FLUSH_INTERVAL, EVENTS_OUTBOX_RETENTION_DAYS,
+    EVENTS_CONFIRM_TIMEOUT,
+)
+from database import SessionLocal, EventOutbox
+
+logger = logging.getLogger(__name__)
+
+# Удаление опубликованных событий не чаще раза в час
+_PURGE_INTERVAL = 3600
+# Ключ advisory-блокировки PostgreSQL: в каждый момент outbox публикует один процесс
+_ADVISORY_LOCK_KEY = 0x686C7476  # 'hltv'
+
+# Сообщение пакета: id строки outbox, ключ маршрутизации, тело, свойства
+Message = Tuple[int, str, bytes, pika.BasicProperties]
+
+
+class ConfirmingChannel:
+    """
+    Канал RabbitMQ с подтверждениями издателя (publisher confirms) без ожидания каждого сообщения.
+
+    Соединение ``SelectConnection`` работает в собственном потоке ioloop. ``publish_batch``
+    отправляет весь пакет, не дожидаясь ответов, и ждет подтверждений (Basic.Ack, в том
+    числе multiple) для всех delivery tag пакета — одно ожидание на пакет вместо круга
+    до брокера на каждое сообщение.
+    """
+
+    def __init__(self, url: str, exchange: str, timeout: float = EVENTS_CONFIRM_TIMEOUT):
+        self.exchange = exchange
+        self.timeout = timeout
+        self._channel = None
+        self._error: Optional[str] = None
+        self._ready = threading.Event()
+        self._done = threading.Event()
+        self._next_tag = 0
+        self._pending: Dict[int, int] = {}   # delivery tag -> id строки outbox
+        self._acked: List[int] = []
+
+        self._connection = pika.SelectConnection(
+            pika.URLParameters(url),
+            on_open_callback=self._on_connection_open,
+            on_open_error_callback=self._on_connection_error,
+            on_close_callback=self._on_connection_closed,
+        )
+        self._thread = threading.Thread(target=self._connection.ioloop.start, name='event-publisher-io', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout) or self._error:
+            error = self._error or 'timeout'
+            self.close()
+            raise AMQPConnectionError(f"Не удалось подключиться к RabbitMQ: {error}")
+
+    # ---- Колбэки ioloop --------------------------------------------------------
+
+    def _on_connection_open(self, connection) -> None:
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_error(self, connection, error) -> None:
+        self._error = repr(error)
+        self._ready.set()
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason) -> None:
+        self._fail(f"соединение закрыто: {reason!r}")
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel) -> None:
+        self._channel = channel
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.exchange_declare(exchange=self.exchange, exchange_type='topic', durable=True,
+                                 callback=self._on_exchange_declared)
+
+    def _on_exchange_declared(self, _frame) -> None:
+        self._channel.confirm_delivery(ack_nack_callback=self._on_confirm, callback=lambda _frame: self._ready.set())
+
+    def _on_channel_closed(self, _channel, reason) -> None:
+        self._fail(f"канал закрыт: {reason!r}")
+        if self._connection.is_open:
+            self._connection.close()
+
+    def _on_confirm(self, frame) -> None:
+        method = frame.method
+        if method.multiple:
+            tags = [tag for tag in self._pending if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._pending else []
+        row_ids = [self._pending.pop(tag) for tag in tags]
+        if isinstance(method, spec.Basic.Ack):
+            self._acked.extend(row_ids)
+        else:
+            self._error = f"брокер отклонил {len(row_ids)} сообщений (nack)"
+        if not self._pending:
+            self._done.set()
+
+    def _fail(self, error: str) -> None:
+        self._error = self._error or error
+        self._ready.set()
+        self._done.set()
+
+    # ---- Публикация ------------------------------------------------------------
+
+    @property
+    def is_open(self) -> bool:
+        return self._error is None and self._connection.is_open
+
+    def publish_batch(self, messages: List[Message]) -> Tuple[List[int], Optional[str]]:
+        """
+        Опубликовать пакет и дождаться подтверждений.
+
+        Returns:
+            (id строк, подтвержденных брокером; ошибка или None). После ошибки канал
+            закрывается: неподтвержденные сообщения публикуются заново новым каналом.
+        """
+        self._acked = []
+        self._done.clear()
+
+        def publish() -> None:
+            try:
+                for row_id, routing_key, body, properties in messages:
+                    self._channel.basic_publish(self.exchange, routing_key, body, properties)
+                    self._next_tag += 1
+                    self._pending[self._next_tag] = row_id
+            except Exception as e:
+                self._fail(repr(e))
+            if not self._pending:
+                self._done.set()
+
+        self._connection.ioloop.add_callback_threadsafe(publish)
+        if not self._done.wait(self.timeout):
+            self._error = self._error or f"нет подтверждений брокера за {self.timeout} с"
+        error = self._error
+        acked = list(self._acked)
+        if error:
+            self.close()
+        return acked, error
+
+    def close(self) -> None:
+        """Закрыть соединение и остановить поток ioloop"""
+        def _close() -> None:
+            if self._connection.is_open:
+                self._connection.close()
+            elif not self._connection.is_closing:
+                self._connection.ioloop.stop()
+
+        if self._thread.is_alive():
+            try:
+                self._connection.ioloop.add_callback_threadsafe(_close)
+            except Exception:
+                pass
+            self._thread.join(self.timeout)
+
+
+class EventPublisher:
+    """
+    Публикует события из таблицы event_outbox в topic exchange RabbitMQ.
+
+    События записываются в outbox в той же транзакции, что и изменения данных
+    (``database.record_events``), а публикатор в фоновом потоке каждые ``interval``
+    секунд забирает до ``batch_size`` неопубликованных строк и отправляет их пакетом
+    через ``ConfirmingChannel``. Транзакции с БД короткие и не открыты во время
+    сетевого обмена: чтение пакета, публикация, отметка published_at (или attempts и
+    last_error для неподтвержденных). Одновременную публикацию несколькими процессами
+    исключает advisory-блокировка PostgreSQL. Строка помечается опубликованной только
+    после подтверждения брокера, поэтому при недоступности RabbitMQ события не теряются
+    (доставка "как минимум один раз", у каждого сообщения стабильный message_id).
+    """
+
+    def __init__(self, url: str = RABBITMQ_URL, exchange: str = EVENTS_EXCHANGE,
+                 batch_size: int = EVENTS_BATCH_SIZE, interval: float = EVENTS_FLUSH_INTERVAL,
+                 retention_days: int = EVENTS_OUTBOX_RETENTION_DAYS,
+                 session_factory: Callable[[], Session] = SessionLocal,
+                 channel_factory: Callable[[str, str], ConfirmingChannel] = ConfirmingChannel):
+        self.url = url
+        self.exchange = exchange
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retention_days = retention_days
+        self.session_factory = session_factory
+        self.channel_factory = channel_factory
+
+        self._channel: Optional[ConfirmingChannel] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_purge = 0.0
+        self.published = 0
+
+    def _ensure_channel(self) -> ConfirmingChannel:
+        """Открыть соединение и канал с подтверждениями, если их еще нет"""
+        if self._channel is not None and self._channel.is_open:
+            return self._channel
+        self._close_channel()
+        self._channel = self.channel_factory(self.url, self.exchange)
+        logger.info(f"Подключение к RabbitMQ установлено, exchange {self.exchange}")
+        return self._channel
+
+    def _close_channel(self) -> None:
+        if self._channel is not None:
+            self._channel.close()
+        self._channel = None
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[bool]:
+        """
+        Сессионная advisory-блокировка PostgreSQL на время прохода публикации.
+
+        Держится на отдельном соединении без открытой транзакции; False — outbox
+        сейчас публикует другой процесс. Для других СУБД блокировка не берется.
+        """
+        with self.session_factory() as db:
+            bind = db.get_bind()
+        if bind.dialect.name != 'postgresql':
+            yield True
+            return
+        with bind.connect() as conn:
+            locked = conn.execute(select(func.pg_try_advisory_lock(_ADVISORY_LOCK_KEY))).scalar()
+            conn.commit()
+            try:
+                yield bool(locked)
+            finally:
+                if locked:
+                    conn.execute(select(func.pg_advisory_unlock(_ADVISORY_LOCK_KEY)))
+                    conn.commit()
+
+    def publish_pending(self) -> int:
+        """
+        Опубликовать один пакет неопубликованных событий.
+
+        Returns:
+            Количество опубликованных событий.
+        """
+        with self._exclusive() as locked:
+            if not locked:
+                return 0
+
+            with self.session_factory() as db:
+                rows = db.execute(
+                    select(EventOutbox.id, EventOutbox.event_type, EventOutbox.routing_key, EventOutbox.payload)
+                    .where(EventOutbox.published_at.is_(None))
+                    .order_by(EventOutbox.id)
+                    .limit(self.batch_size)
+                ).all()
+            if not rows:
+                return 0
+
+            messages: List[Message] = [
+                (
+                    row.id,
+                    row.routing_key,
+                    json.dumps(row.payload, ensure_ascii=False).encode('utf-8'),
+                    pika.BasicProperties(
+                        content_type='application/json',
+                        delivery_mode=2,
+                        message_id=f"hltv-event-{row.id}",
+                        type=row.event_type,
+                        timestamp=int(time.time()),
+                    ),
+                )
+                for row in rows
+            ]
+            try:
+                published_ids, error = self._ensure_channel().publish_batch(messages)
+            except AMQPError as e:
+                published_ids, error = [], repr(e)
+                self._close_channel()
+
+            acked = set(published_ids)
+            failed_ids = [row.id for row in rows if row.id not in acked] if error else []
+            with self.session_factory() as db:
+                if published_ids:
+                    db.execute(
+                        update(EventOutbox)
+                        .where(EventOutbox.id.in_(published_ids))
+                        .values(published_at=datetime.now())
+                    )
+                if failed_ids:
+                    db.execute(
+                        update(EventOutbox)
+                        .where(EventOutbox.id.in_(failed_ids))
+                        .values(attempts=EventOutbox.attempts + 1, last_error=error[:1000])
+                    )
+                db.commit()
+
+        if error:
+            logger.error(f"Ошибка публикации событий в RabbitMQ: {error}")
+        self.published += len(published_ids)
+        if published_ids:
+            logger.info(f"Опубликовано событий: {len(published_ids)}")
+        return len(published_ids)
+
+    def flush(self) -> int:
+        """Публиковать пакеты, пока в outbox есть события или пока не случится ошибка"""
+        total = 0
+        while True:
+            published = self.publish_pending()
+            total += published
+            if published < self.batch_size:
+                return total
+
+    def purge_published(self) -> int:
+        """Удалить опубликованные события старше retention_days дней"""
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        with self.session_factory() as db:
+            result = db.execute(
+                delete(EventOutbox)
+                .where(EventOutbox.published_at.is_not(None), EventOutbox.published_at < cutoff)
+            )
+            db.commit()
+        if result.rowcount:
+            logger.info(f"Удалено опубликованных событий из outbox: {result.rowcount}")
+        return result.rowcount
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.flush()
+                if time.monotonic() - self._last_purge > _PURGE_INTERVAL:
+                    self.purge_published()
+                    self._last_purge = time.monotonic()
+            except Exception as e:
+                logger.error(f"Ошибка публикатора событий: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> 'EventPublisher':
+        """Запустить публикацию в фоновом потоке"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='event-publisher', daemon=True)
+            self._thread.start()
+            logger.info(f"Публикатор событий запущен (пакет {self.batch_size}, интервал {self.interval} с)")
+        return self
+
+    def stop(self) -> None:
+        """Остановить фоновый поток, опубликовать оставшиеся события и закрыть соединение"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Не удалось опубликовать оставшиеся события: {e}")
+        finally:
+            self._close_channel()
+        logger.info(f"Публикатор событий остановлен, опубликовано событий: {self.published}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
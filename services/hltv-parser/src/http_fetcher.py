@@ -0,0 +1,188 @@
+"""
+Lightweight HTTP fetch path for HLTV pages
+Быстрая загрузка страниц HLTV через keep-alive HTTP сессию без браузера
+"""
+
+import time
+import threading
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from config.settings import DEFAULT_HEADERS, REQUEST_TIMEOUT, HTTP_FETCH_ENABLED, HTTP_POOL_SIZE
+from cookie_store import CookieStore
+from metrics import CLOUDFLARE_CHALLENGES
+from page_cache import PageCache
+from webdriver_factory import USER_AGENT
+
+logger = logging.getLogger(__name__)
+
+# Признаки страницы-проверки Cloudflare (скрипт challenge-platform встречается и на
+# обычных страницах, поэтому ориентируемся на заголовок и параметры проверки)
+CHALLENGE_MARKERS = ('<title>just a moment', 'checking your browser', '_cf_chl_opt')
+
+
+def is_challenge_page(html: str) -> bool:
+    """Проверить, является ли страница проверкой Cloudflare"""
+    head = html[:20000].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Секунды из заголовка Retry-After (число секунд или HTTP дата)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpThrottled(Exception):
+    """Сервер ограничивает частоту запросов (429 или 503 без проверки Cloudflare)"""
+
+    def __init__(self, url: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"{url}: статус {status}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+
+class HttpFetcher:
+    """
+    Загрузка страниц через пул keep-alive HTTP соединений.
+
+    Использует cookies, полученные браузером после прохождения Cloudflare, и тот же
+    User-Agent, что и браузер (clearance-cookie привязана к нему). Если сервер отдает
+    проверку Cloudflare (страницу проверки или 403), ``fetch`` возвращает None, и
+    вызывающий код переключается на браузер; HTTP путь снова включается после
+    следующей передачи cookies из браузера. Обычное ограничение частоты (429, 503 без
+    страницы проверки) HTTP путь не выключает: ``fetch`` поднимает ``HttpThrottled``
+    со значением Retry-After, и вызывающий код ждет и повторяет запрос.
+
+    Если задан ``page_cache``, устаревшие записи кэша перепроверяются условным
+    запросом (ETag / Last-Modified), а новые ответы сохраняются в кэш.
+
+    Если задан ``cookie_store``, сессия стартует с cookies прошлых запусков, а
+    cookies браузера после прохождения проверки сохраняются на диск.
+    """
+
+    def __init__(self, enabled: bool = HTTP_FETCH_ENABLED, pool_size: int = HTTP_POOL_SIZE,
+                 page_cache: Optional[PageCache] = None, cookie_store: Optional[CookieStore] = None):
+        self.enabled = enabled
+        self.page_cache = page_cache
+        self.cookie_store = cookie_store
+        self._lock = threading.Lock()
+        self._challenged = False
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.headers['User-Agent'] = USER_AGENT
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        if cookie_store:
+            self._set_cookies(cookie_store.load())
+
+    @property
+    def available(self) -> bool:
+        """Можно ли сейчас пробовать HTTP путь"""
+        return self.enabled and not self._challenged
+
+    def _set_cookies(self, cookies: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for cookie in cookies:
+                self.session.cookies.set(
+                    cookie['name'],
+                    cookie['value'],
+                    domain=cookie.get('domain'),
+                    path=cookie.get('path', '/'),
+                )
+            self._challenged = False
+
+    def update_cookies(self, driver: WebDriver) -> None:
+        """Перенести cookies из браузера в HTTP сессию (и сохранить их на диск)"""
+        if not self.enabled and not self.cookie_store:
+            return
+        try:
+            cookies = driver.get_cookies()
+        except Exception as e:
+            logger.warning(f"Не удалось получить cookies из браузера: {e}")
+            return
+
+        if self.cookie_store:
+            self.cookie_store.save(cookies)
+        if self.enabled:
+            self._set_cookies(cookies)
+            logger.debug(f"В HTTP сессию перенесено {len(cookies)} cookies из браузера")
+
+    def fetch(self, url: str, page_type: Optional[str] = None) -> Optional[str]:
+        """
+        Загрузить страницу по HTTP.
+
+        Args:
+            url: адрес страницы.
+            page_type: тип страницы для кэша (ranking, player, matches, match).
+
+        Returns:
+            HTML страницы или None, если нужно использовать браузер.
+
+        Raises:
+            HttpThrottled: сервер ответил 429 или 503 без проверки Cloudflare.
+        """
+        if not self.available:
+            return None
+
+        use_cache = self.page_cache is not None and page_type is not None
+        headers = self.page_cache.validators(url) if use_cache else {}
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            logger.warning(f"HTTP загрузка {url} не удалась: {e}")
+            return None
+
+        if response.status_code == 304 and use_cache:
+            html = self.page_cache.revalidated(url)
+            if html:
+                return html
+
+        html = response.text
+        if response.status_code == 403 or is_challenge_page(html):
+            logger.info(f"HTTP загрузка {url} получила проверку Cloudflare ({response.status_code}), используем браузер")
+            CLOUDFLARE_CHALLENGES.labels(page_type or 'unknown', 'http').inc()
+            with self._lock:
+                self._challenged = True
+            return None
+
+        if response.status_code in (429, 503):
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            logger.info(f"HTTP загрузка {url}: сервер ограничивает запросы ({response.status_code}), Retry-After: {retry_after}")
+            raise HttpThrottled(url, response.status_code, retry_after)
+
+        if response.status_code != 200 or len(html) < 1000:
+            logger.warning(f"HTTP загрузка {url} вернула статус {response.status_code}, размер {len(html)}")
+            return None
+
+        logger.info(f"Страница загружена по HTTP: {url}, размер: {len(html)} символов")
+        if use_cache:
+            self.page_cache.put(
+                url, html, page_type,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+            )
+        return html
+
+    def close(self):
+        """Закрыть HTTP соединения"""
+        self.session.close()
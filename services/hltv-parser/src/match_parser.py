@@ -1,26 +1,29 @@
 import logging
 import re
 import time
+import threading
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 from bs4 import BeautifulSoup
-from selenium.common import WebDriverException
 from selenium.webdriver.firefox.webdriver import WebDriver
 from sqlalchemy.orm import Session
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
+
+from config.settings import TEAM_ALIASES, MAX_RETRIES, HLTV_BASE_URL
+from cookie_store import CookieStore
+from http_fetcher import HttpFetcher
+import metrics
+from page_cache import PageCache
+from page_fetcher import PageFetcher
+from page_parsing import make_soup
+from rate_limiter import RateLimiter
 
 # Попытка опционального импорта модуля database. В режиме dry-run он не обязателен
 try:
-    from database import SessionLocal, Team, Match, get_team_by_name
+    from database import SessionLocal, Team, Match, TeamResolver, record_events
 except ModuleNotFoundError:
     SessionLocal = None  # type: ignore
-    Team = Match = None  # type: ignore
-
-    def get_team_by_name(*_args, **_kwargs):  # type: ignore
-        return None
+    Team = Match = TeamResolver = record_events = None  # type: ignore
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -33,22 +36,35 @@ class MatchParser:
     Собирает информацию о матчах, в которых участвуют команды,
     присутствующие в локальной базе данных.
     """
-    BASE_URL = "https://www.hltv.org"
+    BASE_URL = HLTV_BASE_URL
     PAGE_LOAD_TIMEOUT = 15  # секунд ожидания полной загрузки
-    RETRY_DELAY_BASE = 5    # базовая задержка перед повтором
 
     MATCHES_PAGE = f"{BASE_URL}/matches"
 
-    def __init__(self, driver: WebDriver, dry_run: bool = False):
+    def __init__(self, driver: WebDriver, dry_run: bool = False, http_fetcher: Optional[HttpFetcher] = None,
+                 page_cache: Optional[PageCache] = None, rate_limiter: Optional[RateLimiter] = None,
+                 stop_event: Optional[threading.Event] = None):
         """Создать парсер.
 
         :param driver: Selenium WebDriver
         :param dry_run: Если True — ничего не пишет в БД, только логирует результаты.
+        :param http_fetcher: HTTP сессия для загрузки страниц без браузера.
+        :param page_cache: дисковый кэш загруженных страниц.
+        :param rate_limiter: общий ограничитель частоты запросов к HLTV.
+        :param stop_event: если установлен, загрузка страниц и обход матчей прекращаются.
         """
+        self.stop_event = stop_event or threading.Event()
         self.driver = driver
         self.dry_run = dry_run
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.page_cache = page_cache or PageCache()
+        self._owns_http_fetcher = http_fetcher is None
+        self.http_fetcher = http_fetcher or HttpFetcher(page_cache=self.page_cache, cookie_store=CookieStore())
+        self.page_fetcher = PageFetcher(self.rate_limiter, self.http_fetcher, self.page_cache,
+                                        stop_event=self.stop_event)
         # Сессию создаём только если не в режиме dry-run (чтобы не требовать запущенную БД)
         self.db_session: Optional[Session] = None if dry_run else SessionLocal()
+        self.team_resolver = None if dry_run else TeamResolver(self.db_session, TEAM_ALIASES)
 
     # ---- Контекстный менеджер ------------------------------------------------
 
@@ -58,43 +74,27 @@ class MatchParser:
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.db_session is not None:
             self.db_session.close()
+        if self._owns_http_fetcher:
+            self.http_fetcher.close()
 
-    def _get_page_soup(self, url: str, wait_css_selector: Optional[str] = None, retries: int = 3) -> Optional[BeautifulSoup]:
+    @metrics.observe_fetch('match')
+    def _get_page_soup(self, url: str, wait_css_selector: Optional[str] = None, retries: int = MAX_RETRIES,
+                       page_type: str = 'match') -> Optional[BeautifulSoup]:
         """Загрузить страницу и вернуть BeautifulSoup с поддержкой ретраев.
 
         :param wait_css_selector: CSS-селектор, который должен появиться на странице, прежде
-            чем мы сочтём загрузку успешной. Если None — ждём только readyState.
-        :param retries: количество повторных попыток при ошибках Selenium.
+            чем мы сочтём загрузку успешной. Если None — берётся READY_SELECTORS[page_type].
+            Страница из HTTP ответа без него (например, отрисовываемая скриптами)
+            загружается браузером.
+        :param retries: количество повторных попыток загрузки браузером.
+        :param page_type: тип страницы для TTL дискового кэша.
         """
-        for attempt in range(retries):
-            try:
-                logger.info(f"Загрузка страницы: {url} (попытка {attempt + 1}/{retries})")
-                self.driver.get(url)
-
-                # Ожидаем полной загрузки документа
-                WebDriverWait(self.driver, self.PAGE_LOAD_TIMEOUT).until(
-                    lambda d: d.execute_script('return document.readyState') == 'complete'
-                )
-
-                # Доп. ожидание специфического контента (если задан)
-                if wait_css_selector:
-                    WebDriverWait(self.driver, self.PAGE_LOAD_TIMEOUT).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, wait_css_selector))
-                    )
-
-                return BeautifulSoup(self.driver.page_source, 'html.parser')
-
-            except WebDriverException as e:
-                logger.warning(f"Ошибка Selenium при загрузке {url}: {e}")
-                if attempt < retries - 1:
-                    delay = self.RETRY_DELAY_BASE * (attempt + 1)
-                    logger.info(f"Повтор через {delay} c...")
-                    time.sleep(delay)
-                else:
-                    logger.error("Достигнут лимит попыток загрузки страницы.")
-        return None
+        html = self.page_fetcher.fetch(url, page_type, driver=self.driver, selector=wait_css_selector,
+                                       retries=retries, verify_http=True, ready_timeout=self.PAGE_LOAD_TIMEOUT)
+        return make_soup(html, page_type) if html else None
 
-    def _parse_match_datetime(self, soup: BeautifulSoup) -> Optional[datetime]:
+    @staticmethod
+    def _parse_match_datetime(soup: BeautifulSoup) -> Optional[datetime]:
         """Извлечь дату и время матча со страницы матча."""
         try:
             time_element = soup.find('div', class_='time')
@@ -110,6 +110,119 @@ class MatchParser:
             logger.error(f"Не удалось извлечь или конвертировать дату матча: {e}")
         return None
 
+    @classmethod
+    def _collect_match_elements(cls, soup: BeautifulSoup) -> Tuple[List[Any], List[str]]:
+        """Найти карточки матчей на странице /matches (без дублей и скрытых). Возвращает карточки и их URL."""
+        match_elements = []
+        match_urls = []  # Для вывода пользователю
+        seen_urls = set()
+        for wrapper in soup.find_all('div', class_='matches-list-wrapper'):
+            # Находим все ссылки на матчи, но исключаем те, что расположены внутри
+            # блоков <div class="matches-chronologically-hide"> (скрытые в UI).
+            elems = wrapper.find_all('a', href=re.compile(r'^/matches/\d+/'))
+            for e in elems:
+                if e.find_parent('div', class_='matches-chronologically-hide') is not None:
+                    # Пропускаем скрытые хронологически матчи
+                    continue
+                abs_url = cls.BASE_URL + e['href']
+                if abs_url in seen_urls:
+                    continue  # Уже видели такой матч
+
+                seen_urls.add(abs_url)
+                match_elements.append(e)
+                match_urls.append(abs_url)
+        return match_elements, match_urls
+
+    @staticmethod
+    def _parse_card_teams(match_elem) -> Optional[Tuple[str, str, bool, bool]]:
+        """Извлечь команды из карточки матча: (team1, team2, team1 неизвестна, team2 неизвестна).
+
+        Возвращает None, если в карточке не две команды.
+        """
+        team_names_divs = match_elem.find_all('div', class_='matchTeamName')
+        if len(team_names_divs) != 2:
+            return None
+
+        team1_name = team_names_divs[0].text.strip()
+        team2_name = team_names_divs[1].text.strip()
+
+        # Определяем, есть ли полноценные блоки команд в карточке. Если нет — считаем команду неизвестной.
+        is_team1_unknown = match_elem.find('div', class_='match-team team1') is None
+        is_team2_unknown = match_elem.find('div', class_='match-team team2') is None
+
+        # Для логов: если команда неизвестна, маркируем как TBD
+        if is_team1_unknown:
+            team1_name = 'TBD'
+        if is_team2_unknown:
+            team2_name = 'TBD'
+        return team1_name, team2_name, is_team1_unknown, is_team2_unknown
+
+    @staticmethod
+    def _parse_card_datetime(match_elem) -> Optional[datetime]:
+        """Извлечь время матча из карточки на странице /matches (атрибут data-unix)."""
+        try:
+            time_element = match_elem.find(attrs={'data-unix': True})
+            if time_element:
+                return datetime.fromtimestamp(int(time_element['data-unix']) / 1000)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Не удалось конвертировать время из карточки матча: {e}")
+        return None
+
+    @staticmethod
+    def _parse_card_format(match_elem) -> Optional[str]:
+        """Извлечь формат матча (bo1/bo3/bo5) из мета-блока карточки на странице /matches."""
+        meta_div = match_elem.find('div', class_=['matchMeta', 'match-meta'])
+        if meta_div and meta_div.text:
+            match = re.search(r'bo(\d)', meta_div.text, re.IGNORECASE)
+            if match:
+                return f"bo{match.group(1)}"
+        return None
+
+    def _load_known_schedules(
+            self, hltv_ids: List[int]) -> Dict[int, Tuple[Optional[datetime], Optional[str], Optional[int], Optional[int]]]:
+        """Загрузить время, формат и команды уже сохраненных матчей одним запросом."""
+        if self.dry_run or not hltv_ids:
+            return {}
+        rows = self.db_session.query(
+            Match.hltv_id, Match.scheduled_at, Match.match_format, Match.team1_id, Match.team2_id,
+        ).filter(Match.hltv_id.in_(hltv_ids)).all()
+        return {hltv_id: tuple(known) for hltv_id, *known in rows}
+
+    @staticmethod
+    def _match_payload(match_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Тело события о матче"""
+        scheduled_at = match_data.get('scheduled_at')
+        return {
+            'hltv_id': match_data['hltv_id'],
+            'team1_id': match_data.get('team1_id'),
+            'team2_id': match_data.get('team2_id'),
+            'scheduled_at': scheduled_at.isoformat() if scheduled_at else None,
+            'match_format': match_data.get('match_format'),
+            'hltv_url': match_data.get('hltv_url'),
+        }
+
+    @classmethod
+    def _match_change_events(cls, existing_match: Match, match_data: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        События об изменении сохраненного матча: match.rescheduled при смене времени,
+        match.updated при смене команд или формата; пустой список, если ничего не изменилось.
+        """
+        events = []
+        payload = cls._match_payload(match_data)
+        if existing_match.scheduled_at != match_data['scheduled_at']:
+            previous = existing_match.scheduled_at
+            events.append(('match.rescheduled', {
+                **payload, 'previous_scheduled_at': previous.isoformat() if previous else None,
+            }))
+        changed = {
+            field: getattr(existing_match, field)
+            for field in ('team1_id', 'team2_id', 'match_format')
+            if field in match_data and getattr(existing_match, field) != match_data[field]
+        }
+        if changed:
+            events.append(('match.updated', {**payload, 'previous': changed}))
+        return events
+
     def save_match_to_database(self, match_data: Dict[str, Any]):
         """Сохранить или обновить матч в базе данных."""
         
@@ -117,10 +230,12 @@ class MatchParser:
             logger.info(f"[DRY RUN] Матч к сохранению: {match_data}")
             return
 
+        started = time.monotonic()
         existing_match = self.db_session.query(Match).filter(Match.hltv_id == match_data['hltv_id']).first()
         
         if existing_match:
             logger.info(f"Матч {match_data['hltv_id']} уже существует. Обновляем...")
+            record_events(self.db_session, self._match_change_events(existing_match, match_data))
             existing_match.team1_id = match_data['team1_id']
             existing_match.team2_id = match_data['team2_id']
             existing_match.scheduled_at = match_data['scheduled_at']
@@ -131,9 +246,11 @@ class MatchParser:
             logger.info(f"Создаем новый матч {match_data['hltv_id']} в базе.")
             new_match = Match(**match_data)
             self.db_session.add(new_match)
+            record_events(self.db_session, [('match.created', self._match_payload(match_data))])
             
         try:
             self.db_session.commit()
+            metrics.observe_db_write('match', time.monotonic() - started, {'matches': 1})
         except Exception as e:
             logger.error(f"Ошибка при сохранении матча {match_data['hltv_id']} в БД: {e}")
             self.db_session.rollback()
@@ -143,77 +260,58 @@ class MatchParser:
         Основной метод. Парсит страницу с матчами и сохраняет релевантные в БД.
         """
         # Переходим на страницу всех матчей и ждём, пока появится секция Upcoming
-        soup = self._get_page_soup(self.MATCHES_PAGE, 'div.matches-list-wrapper')
+        soup = self._get_page_soup(self.MATCHES_PAGE, 'div.matches-list-wrapper', page_type='matches')
         if not soup:
             logger.error("Не удалось создать BeautifulSoup из исходного кода страницы.")
             return
 
-        matches_wrappers = soup.find_all('div', class_='matches-list-wrapper')
-        if not matches_wrappers:
+        parse_started = time.monotonic()
+        if not soup.find('div', class_='matches-list-wrapper'):
             logger.warning("Не найдено 'div.matches-list-wrapper' — проверьте верстку HLTV.")
             return
 
-        match_elements = []
-        match_urls = []  # Для вывода пользователю
-        seen_urls = set()
-        for wrapper in matches_wrappers:
-            # Находим все ссылки на матчи, но исключаем те, что расположены внутри
-            # блоков <div class="matches-chronologically-hide"> (скрытые в UI).
-            elems = wrapper.find_all('a', href=re.compile(r'^/matches/\d+/'))
-            for e in elems:
-                if e.find_parent('div', class_='matches-chronologically-hide') is not None:
-                    # Пропускаем скрытые хронологически матчи
-                    continue
-                abs_url = self.BASE_URL + e['href']
-                if abs_url in seen_urls:
-                    continue  # Уже видели такой матч
-
-                seen_urls.add(abs_url)
-                match_elements.append(e)
-                match_urls.append(abs_url)
+        match_elements, match_urls = self._collect_match_elements(soup)
 
+        metrics.observe_parse('matches', time.monotonic() - parse_started, len(match_elements))
         logger.info(f"Найдено {len(match_elements)} ссылок на предстоящие матчи для анализа.")
 
+        # Загружаем команды из БД один раз на весь список матчей
+        if self.team_resolver is not None:
+            self.team_resolver.refresh()
+
+        # Расписание уже известных матчей, чтобы не открывать их детальные страницы
+        known_schedules = self._load_known_schedules([
+            int(m.group(1)) for m in (re.search(r'/matches/(\d+)/', url) for url in match_urls) if m
+        ])
+        skipped_unchanged = 0
+
         # Выводим полный список URL (удобно для ручной проверки)
         for url in match_urls:
             logger.info(f"MATCH_URL: {url}")
 
         for match_elem in match_elements:
+            if self.stop_event.is_set():
+                logger.info("Обход матчей остановлен")
+                break
             try:
-                # Извлекаем названия команд
-                team_names_divs = match_elem.find_all('div', class_='matchTeamName')
-                if len(team_names_divs) != 2:
+                card_teams = self._parse_card_teams(match_elem)
+                if card_teams is None:
                     continue  # Интересуют только матчи 1 на 1
-
-                team1_name = team_names_divs[0].text.strip()
-                team2_name = team_names_divs[1].text.strip()
-
-                # Определяем, есть ли полноценные блоки команд в карточке. Если нет — считаем команду неизвестной.
-                team1_div_present = match_elem.find('div', class_='match-team team1') is not None
-                team2_div_present = match_elem.find('div', class_='match-team team2') is not None
-
-                is_team1_unknown = not team1_div_present
-                is_team2_unknown = not team2_div_present
-
-                # Для логов: если команда неизвестна, маркируем как TBD
-                if is_team1_unknown:
-                    team1_name = 'TBD'
-                if is_team2_unknown:
-                    team2_name = 'TBD'
+                team1_name, team2_name, is_team1_unknown, is_team2_unknown = card_teams
 
                 # Проверяем наличие обеих команд в нашей БД
                 if not self.dry_run:
-                    team1_db = get_team_by_name(self.db_session, team1_name)
-                    team2_db = get_team_by_name(self.db_session, team2_name)
+                    team1_db_id = self.team_resolver.resolve(team1_name)
+                    team2_db_id = self.team_resolver.resolve(team2_name)
                     
-                    if not (team1_db and team2_db):
+                    if not (team1_db_id and team2_db_id):
                         logger.info(f"Пропуск матча '{team1_name}' vs '{team2_name}', одной или обеих команд нет в БД.")
                         continue
 
-                    logger.info(f"Найден релевантный матч: '{team1_name}' (ID: {team1_db.id}) vs '{team2_name}' (ID: {team2_db.id})")
+                    logger.info(f"Найден релевантный матч: '{team1_name}' (ID: {team1_db_id}) vs '{team2_name}' (ID: {team2_db_id})")
                 else:
                     # В режиме dry-run считаем матч релевантным без проверки БД
-                    team1_db = team2_db = None
+                    team1_db_id = team2_db_id = None
 
                 # Получаем ссылку на детальную страницу матча
                 match_url = self.BASE_URL + match_elem['href']
@@ -223,26 +321,48 @@ class MatchParser:
                 
                 hltv_match_id = int(match_id_match.group(1))
 
-                # Переходим на страницу матча для получения даты
-                detail_soup = self._get_page_soup(match_url)
-                if not detail_soup:
-                    logger.warning(f"Не удалось загрузить детальную страницу для матча {hltv_match_id}")
-                    continue
-
-                scheduled_time = self._parse_match_datetime(detail_soup)
-                if not scheduled_time:
-                    logger.warning(f"Не удалось получить дату для матча {hltv_match_id}")
-                    continue
-                
-                match_format = self._parse_match_format(detail_soup) or 'TBD'
+                # Время и формат берем из карточки списка, если они там есть
+                card_time = self._parse_card_datetime(match_elem)
+                card_format = self._parse_card_format(match_elem)
 
                 # Определяем идентификаторы команд с учётом неизвестных.
                 if self.dry_run:
                     team1_id_val = 0 if is_team1_unknown else None
                     team2_id_val = 0 if is_team2_unknown else None
                 else:
-                    team1_id_val = 0 if is_team1_unknown else (team1_db.id if team1_db else 0)
-                    team2_id_val = 0 if is_team2_unknown else (team2_db.id if team2_db else 0)
+                    team1_id_val = 0 if is_team1_unknown else (team1_db_id or 0)
+                    team2_id_val = 0 if is_team2_unknown else (team2_db_id or 0)
+
+                # Пропускаем, только если не изменились ни расписание, ни команды
+                # (например, вместо TBD еще не появился соперник)
+                known = known_schedules.get(hltv_match_id)
+                if (known and card_time and known[0] == card_time and card_format in (None, known[1])
+                        and known[2:] == (team1_id_val, team2_id_val)):
+                    logger.info(f"Матч {hltv_match_id} без изменений, пропускаем.")
+                    skipped_unchanged += 1
+                    continue
+
+                if card_time and card_format:
+                    scheduled_time, match_format = card_time, card_format
+                else:
+                    # Переходим на страницу матча только для новых или изменившихся матчей
+                    detail_soup = self._get_page_soup(match_url)
+                    if not detail_soup:
+                        logger.warning(f"Не удалось загрузить детальную страницу для матча {hltv_match_id}")
+                        continue
+
+                    parse_started = time.monotonic()
+                    detail_time = self._parse_match_datetime(detail_soup)
+                    detail_format = self._parse_match_format(detail_soup)
+                    metrics.observe_parse('match', time.monotonic() - parse_started,
+                                          (detail_time is not None) + (detail_format is not None))
+
+                    scheduled_time = detail_time or card_time
+                    if not scheduled_time:
+                        logger.warning(f"Не удалось получить дату для матча {hltv_match_id}")
+                        continue
+                    
+                    match_format = detail_format or card_format or 'TBD'
 
                 match_data = {
                     'hltv_id': hltv_match_id,
@@ -255,15 +375,12 @@ class MatchParser:
                 }
 
                 self.save_match_to_database(match_data)
-                
-                # Бережём HLTV: небольшая пауза между запросами
-                time.sleep(3) 
 
             except Exception as e:
                 logger.error(f"Произошла непредвиденная ошибка при обработке матча: {e}")
                 continue
         
-        logger.info("Парсинг предстоящих матчей завершен.")
+        logger.info(f"Парсинг предстоящих матчей завершен. Без изменений пропущено: {skipped_unchanged}.")
 
     @staticmethod
     def _parse_match_format(soup: BeautifulSoup) -> Optional[str]:
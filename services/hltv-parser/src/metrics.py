@@ -0,0 +1,164 @@
+"""
+Scraping metrics for HLTV Parser
+Метрики парсинга в формате Prometheus: загрузка, разбор и запись в БД
+"""
+
+import time
+import logging
+import functools
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+from config.settings import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Загрузка страниц. source: cache, http или browser
+FETCH_SECONDS = Histogram(
+    'hltv_fetch_seconds', 'Длительность загрузки страницы', ['page_type', 'source'],
+    buckets=(0.05, 0.25, 1, 2.5, 5, 10, 20, 40, 80, 160),
+)
+FETCH_TOTAL = Counter('hltv_fetch_total', 'Загрузки страниц', ['page_type', 'source', 'outcome'])
+FETCH_BYTES = Counter('hltv_fetch_bytes_total', 'Объем загруженного HTML', ['page_type', 'source'])
+FETCH_RETRIES = Counter('hltv_fetch_retries_total', 'Повторные попытки загрузки', ['page_type'])
+CLOUDFLARE_CHALLENGES = Counter(
+    'hltv_cloudflare_challenges_total', 'Проверки Cloudflare', ['page_type', 'client'],
+)
+CLOUDFLARE_WAIT_SECONDS = Histogram(
+    'hltv_cloudflare_wait_seconds', 'Ожидание прохождения проверки Cloudflare в браузере', ['page_type'],
+    buckets=(1, 5, 10, 20, 30, 45, 60),
+)
+
+# Разбор HTML
+PARSE_SECONDS = Histogram(
+    'hltv_parse_seconds', 'Длительность разбора страницы', ['page_type'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PARSE_ELEMENTS = Histogram(
+    'hltv_parse_elements', 'Найдено элементов на странице (команд, матчей, показателей)', ['page_type'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250),
+)
+
+# Запись в БД
+DB_WRITE_SECONDS = Histogram(
+    'hltv_db_write_seconds', 'Длительность записи в БД', ['operation'],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_ROWS = Counter('hltv_db_rows_total', 'Записано строк в БД', ['table'])
+# scope: batch — пакет не записан целиком, row — не записана команда (с игроками) или игрок
+DB_WRITE_ERRORS = Counter('hltv_db_write_errors_total', 'Ошибки записи в БД', ['scope'])
+
+_fetch_state = threading.local()
+
+
+def fetched(page_type: str, source: str, html: Optional[str]) -> None:
+    """Отметить, откуда получена страница (вызывается в точке успешной загрузки)"""
+    _fetch_state.source = source
+    if html:
+        FETCH_BYTES.labels(page_type, source).inc(len(html.encode('utf-8')))
+
+
+def observe_fetch(default_page_type: str) -> Callable:
+    """
+    Декоратор метода загрузки страницы: длительность и результат (None — неудача).
+
+    Тип страницы берется из аргумента ``page_type``, если он передан, иначе
+    ``default_page_type``; источник — из последнего вызова ``fetched`` в этом потоке.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            page_type = kwargs.get('page_type') or default_page_type
+            _fetch_state.source = None
+            started = time.monotonic()
+            result = func(*args, **kwargs)
+            source = getattr(_fetch_state, 'source', None) or 'browser'
+            FETCH_SECONDS.labels(page_type, source).observe(time.monotonic() - started)
+            FETCH_TOTAL.labels(page_type, source, 'ok' if result is not None else 'failed').inc()
+            return result
+        return wrapper
+    return decorator
+
+
+def observe_parse(page_type: str, seconds: float, elements: Optional[int] = None) -> None:
+    """Записать длительность разбора и количество найденных элементов"""
+    PARSE_SECONDS.labels(page_type).observe(seconds)
+    if elements is not None:
+        PARSE_ELEMENTS.labels(page_type).observe(elements)
+
+
+def observe_db_write(operation: str, seconds: float, rows: Dict[str, int]) -> None:
+    """Записать длительность записи в БД и количество строк по таблицам"""
+    DB_WRITE_SECONDS.labels(operation).observe(seconds)
+    for table, count in rows.items():
+        if count:
+            DB_ROWS.labels(table).inc(count)
+
+
+def run_summary() -> Dict[str, Dict[str, Any]]:
+    """
+    Итоги по метрикам парсинга: для гистограмм — количество, сумма и среднее,
+    для счетчиков — значение; ключ — метрика с метками.
+    """
+    summary: Dict[str, Dict[str, Any]] = defaultdict(dict)
+    for metric in REGISTRY.collect():
+        if not metric.name.startswith('hltv_'):
+            continue
+        for sample in metric.samples:
+            labels = ','.join(f"{k}={v}" for k, v in sorted(sample.labels.items()) if k != 'le')
+            key = f"{metric.name}{{{labels}}}"
+            if sample.name.endswith('_count'):
+                summary[key]['count'] = int(sample.value)
+            elif sample.name.endswith('_sum'):
+                summary[key]['sum'] = sample.value
+            elif sample.name.endswith('_total'):
+                summary[key]['value'] = sample.value
+    for values in summary.values():
+        if values.get('count'):
+            values['avg'] = values['sum'] / values['count']
+    return dict(summary)
+
+
+def log_run_summary() -> None:
+    """Вывести итоги прогона в лог"""
+    summary = run_summary()
+    if not summary:
+        return
+    logger.info("Итоги прогона:")
+    for key, values in sorted(summary.items()):
+        if 'count' in values:
+            logger.info(
+                f"  {key}: {values['count']} шт., всего {values['sum']:.2f}, "
+                f"в среднем {values.get('avg', 0):.3f}"
+            )
+        else:
+            logger.info(f"  {key}: {values['value']:.0f}")
+
+
+def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT,
+                         routes: Optional[Callable[[Any], None]] = None) -> threading.Thread:
+    """
+    Запустить HTTP эндпоинт /metrics (FastAPI + uvicorn) в фоновом потоке.
+
+    ``routes(app)`` может добавить в приложение свои эндпоинты (например, состояние задач демона).
+    """
+    import uvicorn
+    from fastapi import FastAPI, Response
+
+    app = FastAPI(title="HLTV Parser metrics")
+
+    @app.get('/metrics')
+    def metrics() -> Response:
+        return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+    if routes is not None:
+        routes(app)
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, name="hltv-metrics", daemon=True)
+    thread.start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return thread
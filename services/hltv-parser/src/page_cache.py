@@ -0,0 +1,138 @@
+"""
+On-disk HTML page cache for HLTV Parser
+Дисковый кэш загруженных страниц HLTV с TTL по типу страницы
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Any
+
+from config.settings import PARSING_CONFIG, CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class PageCache:
+    """
+    Кэш HTML страниц на диске.
+
+    Страница хранится сжатой (``<sha256(url)>.html.gz``) рядом с метаданными
+    (``.json``: URL, тип страницы, время загрузки, ETag и Last-Modified).
+    Запись считается свежей, пока не истек TTL ее типа страницы; устаревшая запись
+    остается на диске, чтобы HTTP путь мог перепроверить ее условным запросом.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, enabled: bool = PARSING_CONFIG['enable_caching']):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.default_ttl = PARSING_CONFIG['cache_duration']
+        self.ttls: Dict[str, int] = PARSING_CONFIG.get('cache_durations', {})
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + '.html.gz', base + '.json'
+
+    def _read_meta(self, url: str) -> Optional[Dict[str, Any]]:
+        _, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_html(self, url: str) -> Optional[str]:
+        html_path, _ = self._paths(url)
+        try:
+            with gzip.open(html_path, 'rt', encoding='utf-8') as f:
+                return f.read()
+        except (OSError, EOFError):
+            return None
+
+    def _write_meta(self, url: str, meta: Dict[str, Any]) -> None:
+        _, meta_path = self._paths(url)
+        tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def ttl(self, page_type: str) -> int:
+        """TTL в секундах для типа страницы"""
+        return self.ttls.get(page_type, self.default_ttl)
+
+    def get(self, url: str, page_type: str) -> Optional[str]:
+        """Вернуть HTML из кэша, если запись еще свежая"""
+        if not self.enabled:
+            return None
+        meta = self._read_meta(url)
+        if not meta or time.time() - meta['fetched_at'] > self.ttl(page_type):
+            return None
+        html = self._read_html(url)
+        if html:
+            logger.info(f"Страница взята из кэша: {url}")
+        return html
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Заголовки условного запроса (If-None-Match / If-Modified-Since) для устаревшей записи"""
+        if not self.enabled:
+            return {}
+        meta = self._read_meta(url)
+        if not meta:
+            return {}
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def revalidated(self, url: str) -> Optional[str]:
+        """Сервер ответил 304: продлить запись и вернуть сохраненный HTML"""
+        meta = self._read_meta(url)
+        html = self._read_html(url)
+        if not meta or not html:
+            return None
+        meta['fetched_at'] = time.time()
+        try:
+            self._write_meta(url, meta)
+        except OSError as e:
+            logger.warning(f"Не удалось обновить запись кэша {url}: {e}")
+        logger.info(f"Страница в кэше подтверждена сервером (304): {url}")
+        return html
+
+    def invalidate(self, url: str) -> None:
+        """Удалить страницу из кэша"""
+        for path in self._paths(url):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Не удалось удалить {path} из кэша: {e}")
+
+    def put(self, url: str, html: str, page_type: str,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Сохранить страницу в кэш"""
+        if not self.enabled:
+            return
+        html_path, _ = self._paths(url)
+        try:
+            os.makedirs(os.path.dirname(html_path), exist_ok=True)
+            tmp_path = f"{html_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp_path, html_path)
+            self._write_meta(url, {
+                'url': url,
+                'page_type': page_type,
+                'fetched_at': time.time(),
+                'etag': etag,
+                'last_modified': last_modified,
+            })
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить страницу {url} в кэш: {e}")
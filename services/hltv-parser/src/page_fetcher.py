@@ -0,0 +1,184 @@
+"""
+Page fetch orchestration for HLTV Parser
+Загрузка страницы HLTV: дисковый кэш, keep-alive HTTP, браузер с повторами
+"""
+
+import logging
+import threading
+from typing import Optional
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from config.settings import MAX_RETRIES, PAGE_READY_TIMEOUT
+from browser_wait import wait_until_ready, wait_past_challenge, is_challenge_title
+from driver_pool import DriverPool
+from http_fetcher import HttpFetcher, HttpThrottled, is_challenge_page
+import metrics
+from page_cache import PageCache
+from page_parsing import make_soup, READY_SELECTORS
+from rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Признаки блокировки в заголовке страницы
+BLOCKED_TITLES = ('access denied', '403', 'forbidden', 'blocked')
+
+
+class PageFetcher:
+    """
+    Единая цепочка загрузки страницы, общая для парсеров команд, игроков и матчей.
+
+    1. Свежая запись дискового кэша (``PageCache``).
+    2. Keep-alive HTTP сессия (``HttpFetcher``), пока сервер не отдает проверку
+       Cloudflare; на проверке частота запросов снижается (``RateLimiter.report_blocked``).
+       При ограничении частоты (429) запрос повторяется после Retry-After или
+       экспоненциальной задержки, HTTP путь остается включенным.
+    3. Браузер с повторами: ожидание готовности страницы, прохождение проверки
+       Cloudflare, экспоненциальная задержка между попытками. Cookies браузера после
+       успешной загрузки передаются в HTTP сессию, и HTTP путь снова включается.
+
+    Браузер — переданный в ``fetch`` драйвер или свободный драйвер из ``driver_pool``
+    (берется только когда страницы нет в кэше и HTTP путь не сработал).
+
+    После установки ``stop_event`` новые попытки не начинаются, а ожидание проверки
+    Cloudflare прерывается: ``fetch`` возвращает None.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter, http_fetcher: HttpFetcher, page_cache: PageCache,
+                 driver_pool: Optional[DriverPool] = None, stop_event: Optional[threading.Event] = None):
+        self.rate_limiter = rate_limiter
+        self.http_fetcher = http_fetcher
+        self.page_cache = page_cache
+        self.driver_pool = driver_pool
+        self.stop_event = stop_event or threading.Event()
+
+    def fetch(self, url: str, page_type: str, driver: Optional[WebDriver] = None, selector: Optional[str] = None,
+              retries: int = MAX_RETRIES, verify_http: bool = False,
+              ready_timeout: float = PAGE_READY_TIMEOUT) -> Optional[str]:
+        """
+        Загрузить HTML страницы.
+
+        Args:
+            url: адрес страницы.
+            page_type: тип страницы (TTL кэша, метрики, селектор готовности).
+            driver: браузер для загрузки; None — драйвер из driver_pool.
+            selector: CSS-селектор готовой страницы; по умолчанию READY_SELECTORS[page_type].
+            retries: количество попыток загрузки браузером.
+            verify_http: проверять наличие selector в HTTP ответе (для страниц, которые
+                могут дорисовываться скриптами); без него страница загружается браузером.
+            ready_timeout: сколько секунд ждать появления selector в браузере.
+
+        Returns:
+            HTML страницы или None, если загрузить не удалось.
+        """
+        selector = selector or READY_SELECTORS.get(page_type)
+
+        cached = self.page_cache.get(url, page_type)
+        if cached:
+            metrics.fetched(page_type, 'cache', cached)
+            return cached
+
+        html = self._fetch_http(url, page_type, selector if verify_http else None, retries)
+        if html or self.stop_event.is_set():
+            return html
+
+        if driver is not None:
+            return self._fetch_browser(driver, url, page_type, selector, retries, ready_timeout)
+        if self.driver_pool is None:
+            logger.error(f"Нет браузера для загрузки {url}")
+            return None
+        with self.driver_pool.driver() as pooled_driver:
+            return self._fetch_browser(pooled_driver, url, page_type, selector, retries, ready_timeout)
+
+    def _fetch_http(self, url: str, page_type: str, selector: Optional[str], retries: int) -> Optional[str]:
+        """Быстрый HTTP путь; браузер нужен только при проверке Cloudflare"""
+        html = None
+        for attempt in range(retries):
+            if not self.http_fetcher.available or self.stop_event.is_set():
+                return None
+            self.rate_limiter.wait(url)
+            try:
+                html = self.http_fetcher.fetch(url, page_type)
+                break
+            except HttpThrottled as e:
+                self.rate_limiter.report_blocked(url)
+                if attempt < retries - 1:
+                    metrics.FETCH_RETRIES.labels(page_type).inc()
+                    self.rate_limiter.backoff(attempt + 1, e.retry_after)
+        if not html:
+            if not self.http_fetcher.available:
+                self.rate_limiter.report_blocked(url)
+            return None
+
+        self.rate_limiter.report_success(url)
+        if selector and make_soup(html, page_type).select_one(selector) is None:
+            logger.info(f"В HTTP ответе нет '{selector}', загружаем {url} браузером")
+            self.page_cache.invalidate(url)
+            return None
+        metrics.fetched(page_type, 'http', html)
+        return html
+
+    def _fetch_browser(self, driver: WebDriver, url: str, page_type: str, selector: Optional[str],
+                       retries: int, ready_timeout: float) -> Optional[str]:
+        """Загрузить страницу браузером с повторами и экспоненциальной задержкой между ними"""
+        for attempt in range(retries):
+            if attempt > 0:
+                metrics.FETCH_RETRIES.labels(page_type).inc()
+                self.rate_limiter.backoff(attempt)
+            if self.stop_event.is_set():
+                logger.info(f"Загрузка {url} остановлена")
+                return None
+            logger.info(f"Загружаем страницу браузером (попытка {attempt + 1}/{retries}): {url}")
+
+            try:
+                html = self._load_in_browser(driver, url, page_type, selector, ready_timeout)
+            except Exception as e:
+                logger.warning(f"Ошибка браузера при загрузке {url} (попытка {attempt + 1}): {e}")
+                try:
+                    if is_challenge_page(driver.page_source):
+                        self.rate_limiter.report_blocked(url)
+                except Exception:
+                    pass
+                continue
+
+            if html:
+                # Передаем cookies прошедшего проверку браузера в HTTP сессию
+                self.rate_limiter.report_success(url)
+                self.http_fetcher.update_cookies(driver)
+                self.page_cache.put(url, html, page_type)
+                metrics.fetched(page_type, 'browser', html)
+                return html
+
+        logger.error(f"Не удалось загрузить {url} за {retries} попыток")
+        return None
+
+    def _load_in_browser(self, driver: WebDriver, url: str, page_type: str, selector: Optional[str],
+                         ready_timeout: float) -> Optional[str]:
+        """Одна попытка загрузки. None — блокировка, непройденная проверка Cloudflare или неготовая страница"""
+        self.rate_limiter.wait(url)
+        driver.get(url)
+
+        # Ждем появления нужного контента; при проверке Cloudflare — ее прохождения
+        ready = wait_until_ready(driver, selector, ready_timeout)
+        if not ready and is_challenge_title(driver.title):
+            logger.info("Обнаружена защита Cloudflare, ждем прохождения проверки...")
+            if not wait_past_challenge(driver, page_type=page_type, stop_event=self.stop_event):
+                logger.warning("Cloudflare не пропустил за отведенное время")
+                self.rate_limiter.report_blocked(url)
+                return None
+            logger.info(f"Cloudflare пройден! Новый заголовок: {driver.title}")
+            ready = wait_until_ready(driver, selector, ready_timeout)
+
+        page_title = driver.title
+        if any(keyword in page_title.lower() for keyword in BLOCKED_TITLES):
+            logger.warning(f"Страница заблокирована: {page_title}")
+            self.rate_limiter.report_blocked(url)
+            return None
+
+        html = driver.page_source
+        if not ready or len(html) < 1000:
+            logger.warning(f"Страница {url} не готова (ожидали '{selector}'), размер: {len(html)} символов")
+            return None
+
+        logger.info(f"Страница {url} загружена браузером, размер: {len(html)} символов")
+        return html
@@ -0,0 +1,68 @@
+"""
+Shared HTML parsing helpers for HLTV pages
+Построение BeautifulSoup деревьев через lxml только для нужных частей страницы
+"""
+
+from typing import Callable, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+
+def has_class(*names: str) -> Callable[[Optional[str]], bool]:
+    """
+    Условие SoupStrainer: у элемента есть хотя бы один из классов names.
+
+    При разборе SoupStrainer получает атрибут class строкой ("ranked-team standard-box"),
+    поэтому class_='ranked-team' не находит элементы с несколькими классами.
+    """
+    wanted = set(names)
+
+    def matches(value) -> bool:
+        if not value:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return not wanted.isdisjoint(classes)
+    return matches
+
+
+# Части страниц, которые реально читают парсеры. Остальная разметка (шапка, реклама,
+# скрипты, новости) в дерево не попадает.
+PAGE_STRAINERS = {
+    # TeamParser._extract_team_info
+    'ranking': SoupStrainer('div', class_=has_class('ranked-team')),
+    # PlayerParser._extract_basic_info / _extract_statistics
+    'player': SoupStrainer(
+        ['h1', 'div'],
+        class_=has_class('summaryNickname', 'summaryRealname', 'stats-row', 'summaryStatBreakdownRow'),
+    ),
+    # parse_stats_listing_html (список статистики игроков /stats/players)
+    'stats': SoupStrainer('table', class_=has_class('player-ratings-table')),
+    # та же таблица на странице статистики игроков команды /stats/teams/players
+    'team_stats': SoupStrainer('table', class_=has_class('player-ratings-table')),
+    # MatchParser.parse_and_save_upcoming_matches
+    'matches': SoupStrainer('div', class_=has_class('matches-list-wrapper')),
+    # MatchParser._parse_match_datetime / _parse_match_format
+    'match': SoupStrainer('div', class_=has_class('time', 'bestof')),
+}
+
+# Элемент, появление которого в браузере означает, что страница готова к разбору
+READY_SELECTORS = {
+    'ranking': 'div.ranked-team',
+    'player': 'div.stats-row',
+    'stats': 'table.player-ratings-table',
+    'team_stats': 'table.player-ratings-table',
+    'matches': 'div.matches-list-wrapper',
+    'match': 'div.time',
+}
+
+
+def make_soup(html: str, page_type: Optional[str] = None) -> BeautifulSoup:
+    """
+    Разобрать HTML через lxml.
+
+    Args:
+        html: исходный HTML страницы.
+        page_type: тип страницы (ranking, player, stats, team_stats, matches, match). Для известных типов
+            строится только нужное поддерево; для None — полное дерево.
+    """
+    return BeautifulSoup(html, 'lxml', parse_only=PAGE_STRAINERS.get(page_type))
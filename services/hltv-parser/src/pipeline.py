@@ -0,0 +1,146 @@
+"""
+Fetch -> parse -> persist scraping pipeline
+Конвейер парсинга: загрузка страниц, разбор HTML и запись в БД как отдельные стадии
+"""
+
+import time
+import queue
+import multiprocessing
+import logging
+import threading
+from concurrent.futures import FIRST_EXCEPTION, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Iterable, List, Optional
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from driver_pool import DriverPool
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Маркер завершения очереди
+_DONE = object()
+
+# Процессы разбора не форкаются от многопоточного процесса парсера (пул драйверов, uvicorn,
+# публикатор событий, потоки демона): fork копирует захваченные другими потоками блокировки
+_MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+
+class ScrapePipeline:
+    """
+    Конвейер из трех стадий с ограниченными очередями между ними.
+
+    - fetch: воркеры пула драйверов загружают HTML (``fetch(driver, item) -> html``);
+    - parse: HTML разбирается в пуле процессов (``parse(html, item) -> result``,
+      функция уровня модуля, чтобы ее можно было передать в другой процесс);
+    - persist: единственный поток-писатель получает ``persist(item, result)``;
+      result равен None, если страницу загрузить или разобрать не удалось.
+
+    Очереди между стадиями ограничены ``queue_size``: если разбор или запись
+    отстают, загрузчики блокируются, а не накапливают страницы в памяти.
+
+    Если задан ``page_type``, длительность стадии parse (вместе с передачей
+    данных в процесс) пишется в метрики разбора с этим типом страницы.
+
+    Если установлен ``stop_event``, еще не загруженные элементы пропускаются: уже
+    загруженные страницы доходят до записи, и конвейер быстро завершается.
+
+    Если задача загрузки упала (например, не удалось запустить драйвер), остальные
+    задачи отменяются, выполняющиеся дорабатывают, очереди разбираются до конца, и
+    только после этого исключение пробрасывается — воркеры пула драйверов не
+    остаются заблокированными на заполненной очереди.
+    """
+
+    def __init__(self, driver_pool: DriverPool,
+                 fetch: Callable[[WebDriver, Any], Optional[str]],
+                 parse: Callable[[str, Any], Any],
+                 persist: Callable[[Any, Any], None],
+                 parse_workers: int, queue_size: int, page_type: Optional[str] = None,
+                 stop_event: Optional[threading.Event] = None):
+        self.driver_pool = driver_pool
+        self.fetch = fetch
+        self.parse = parse
+        self.persist = persist
+        self.parse_workers = max(1, parse_workers)
+        self.queue_size = queue_size
+        self.page_type = page_type
+        self.stop_event = stop_event
+
+    def run(self, items: Iterable[Any]) -> None:
+        """Прогнать элементы через все стадии и дождаться записи последнего"""
+        parse_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=_MP_CONTEXT) as processes:
+            parsers = [
+                threading.Thread(target=self._parse_loop, args=(processes, parse_q, write_q),
+                                 name=f"hltv-parse-{i}", daemon=True)
+                for i in range(self.parse_workers)
+            ]
+            writer = threading.Thread(target=self._write_loop, args=(write_q,), name="hltv-writer", daemon=True)
+            for thread in parsers + [writer]:
+                thread.start()
+
+            failed = threading.Event()
+            futures: List[Future] = []
+            try:
+                for item in items:
+                    futures.append(self.driver_pool.submit(self._fetch_one, item, parse_q, failed))
+                wait(futures, return_when=FIRST_EXCEPTION)
+                for future in futures:
+                    if future.done() and not future.cancelled() and future.exception() is not None:
+                        raise future.exception()
+            except BaseException:
+                # Новые загрузки не начинаются, выполняющиеся дописывают результат в очередь
+                failed.set()
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                raise
+            finally:
+                for _ in parsers:
+                    parse_q.put(_DONE)
+                for thread in parsers:
+                    thread.join()
+                write_q.put(_DONE)
+                writer.join()
+
+    def _fetch_one(self, driver: WebDriver, item: Any, parse_q: queue.Queue, failed: threading.Event) -> None:
+        if failed.is_set() or (self.stop_event is not None and self.stop_event.is_set()):
+            return
+        try:
+            html = self.fetch(driver, item)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки на стадии fetch ({item}): {e}")
+            html = None
+        parse_q.put((item, html))
+
+    def _parse_loop(self, processes: ProcessPoolExecutor, parse_q: queue.Queue, write_q: queue.Queue) -> None:
+        while True:
+            task = parse_q.get()
+            if task is _DONE:
+                return
+            item, html = task
+            result = None
+            if html:
+                try:
+                    started = time.monotonic()
+                    result = processes.submit(self.parse, html, item).result()
+                    if self.page_type:
+                        metrics.observe_parse(self.page_type, time.monotonic() - started)
+                except Exception as e:
+                    logger.error(f"Ошибка разбора на стадии parse ({item}): {e}")
+            write_q.put((item, result))
+
+    def _write_loop(self, write_q: queue.Queue) -> None:
+        while True:
+            task = write_q.get()
+            if task is _DONE:
+                return
+            item, result = task
+            try:
+                self.persist(item, result)
+            except Exception as e:
+                logger.error(f"Ошибка записи на стадии persist ({item}): {e}")
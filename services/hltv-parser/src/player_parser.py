@@ -6,18 +6,27 @@ HLTV Player Profile Parser
 import re
 import time
 import logging
-from typing import Dict, Optional, Any
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import geckodriver_autoinstaller
+import threading
+from typing import Dict, Iterable, Optional, Any, Set, Tuple
+from urllib.parse import urlencode
+from selenium.webdriver.firefox.webdriver import WebDriver
 from bs4 import BeautifulSoup
-from datetime import datetime, date
 
-from database import SessionLocal, Player, PlayerStatistics
+from config.settings import (
+    MAX_RETRIES, HLTV_BASE_URL, BULK_STATS_LISTINGS, BULK_STATS_REQUIRED_FIELDS, BULK_STATS_PAGE_FIELDS,
+)
+from database import (
+    SessionLocal, Player, upsert_players, upsert_player_statistics, resolve_player_ids,
+    find_players_missing_statistics,
+)
+import metrics
+from cookie_store import CookieStore
+from http_fetcher import HttpFetcher
+from page_cache import PageCache
+from page_fetcher import PageFetcher
+from page_parsing import make_soup
+from rate_limiter import RateLimiter
+from webdriver_factory import create_stealth_driver
 
 logger = logging.getLogger(__name__)
 
@@ -25,186 +34,54 @@ logger = logging.getLogger(__name__)
 class PlayerParser:
     """Парсер профилей игроков с HLTV.org"""
     
-    BASE_URL = "https://www.hltv.org"
+    BASE_URL = HLTV_BASE_URL
     
-    def __init__(self):
-        self.driver = None
+    def __init__(self, driver: Optional[WebDriver] = None, rate_limiter: Optional[RateLimiter] = None,
+                 http_fetcher: Optional[HttpFetcher] = None, page_cache: Optional[PageCache] = None,
+                 stop_event: Optional[threading.Event] = None):
+        """Создать парсер.
+
+        :param driver: готовый WebDriver (например, из пула). Если None — парсер
+            запускает собственный Firefox и закрывает его в close().
+        :param rate_limiter: общий ограничитель частоты запросов к HLTV.
+        :param http_fetcher: общая HTTP сессия для загрузки страниц без браузера.
+        :param page_cache: дисковый кэш загруженных страниц.
+        :param stop_event: если установлен, загрузка страниц прекращается (в том числе ожидание
+            проверки Cloudflare), а обновление статистики останавливается.
+        """
+        self.stop_event = stop_event
+        self.driver = driver
+        self._owns_driver = driver is None
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.page_cache = page_cache or PageCache()
+        self._owns_http_fetcher = http_fetcher is None
+        self.http_fetcher = http_fetcher or HttpFetcher(page_cache=self.page_cache, cookie_store=CookieStore())
+        self.page_fetcher = PageFetcher(self.rate_limiter, self.http_fetcher, self.page_cache,
+                                        stop_event=stop_event)
         self.db = SessionLocal()
-        self._init_driver()
+        if self._owns_driver:
+            self._init_driver()
     
     def _init_driver(self):
         """Инициализация headless Firefox драйвера с обходом защиты от ботов"""
-        try:
-            logger.info("Инициализируем stealth Firefox для парсера игроков...")
-            
-            # Автоматически устанавливаем geckodriver
-            geckodriver_autoinstaller.install()
-            
-            firefox_options = Options()
-            firefox_options.add_argument("--headless")
-            firefox_options.add_argument("--no-sandbox")
-            firefox_options.add_argument("--disable-dev-shm-usage")
-            firefox_options.add_argument("--window-size=1920,1080")
-            
-            # Настраиваем профиль Firefox для обхода детекции ботов
-            firefox_profile = webdriver.FirefoxProfile()
-            
-            # Стандартный User-Agent
-            user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0"
-            firefox_profile.set_preference("general.useragent.override", user_agent)
-            logger.info(f"Используем User-Agent: {user_agent}")
-            
-            # Загружаем изображения для более реалистичного поведения
-            firefox_profile.set_preference("permissions.default.image", 1)
-            
-            # Настройки для обхода детекции веб-драйвера
-            firefox_profile.set_preference("dom.webdriver.enabled", False)
-            firefox_profile.set_preference("useAutomationExtension", False)
-            firefox_profile.set_preference("marionette.enabled", False)
-            
-            # Отключаем автоматизацию в navigator
-            firefox_profile.set_preference("dom.disable_beforeunload", True)
-            firefox_profile.set_preference("dom.successive_dialog_time_limit", 0)
-            
-            # Настройки для имитации реального браузера
-            firefox_profile.set_preference("network.http.connection-retry-timeout", 0)
-            firefox_profile.set_preference("network.http.connection-timeout", 90)
-            firefox_profile.set_preference("network.http.response.timeout", 90)
-            
-            # Включаем JavaScript (нужен для HLTV)
-            firefox_profile.set_preference("javascript.enabled", True)
-            
-            # Настройки приватности
-            firefox_profile.set_preference("privacy.trackingprotection.enabled", False)
-            firefox_profile.set_preference("network.cookie.cookieBehavior", 0)
-            
-            # Языковые настройки
-            firefox_profile.set_preference("intl.accept_languages", "en-US,en;q=0.9")
-            
-            # Дополнительные настройки для обхода детекции
-            firefox_profile.set_preference("media.peerconnection.enabled", False)
-            firefox_profile.set_preference("media.navigator.enabled", False)
-            firefox_profile.set_preference("webgl.disabled", True)
-            firefox_profile.set_preference("media.autoplay.default", 0)
-            
-            # Настройки времени загрузки
-            firefox_profile.set_preference("network.http.connection-timeout", 120)
-            firefox_profile.set_preference("network.http.response.timeout", 120)
-            
-            firefox_options.profile = firefox_profile
-            
-            self.driver = webdriver.Firefox(options=firefox_options)
-            self.driver.set_page_load_timeout(60)  # Увеличиваем таймаут
-            self.driver.implicitly_wait(15)
-            
-            # Устанавливаем размер окна для имитации реального браузера
-            self.driver.set_window_size(1920, 1080)
-            
-            # Выполняем JavaScript для дополнительного сокрытия автоматизации
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            
-            logger.info("Stealth Firefox для парсера игроков инициализирован успешно")
-            
-        except Exception as e:
-            logger.error(f"Ошибка инициализации Firefox драйвера: {e}")
-            raise
+        logger.info("Инициализируем stealth Firefox для парсера игроков...")
+        self.driver = create_stealth_driver(cookies=CookieStore().load())
     
-    def _fetch_player_page(self, player_id: int, nickname: str, retries: int = 3) -> Optional[BeautifulSoup]:
-        """Загрузить страницу профиля игрока с имитацией человеческого поведения"""
-        url = f"{self.BASE_URL}/stats/players/{player_id}/{nickname}"
-        
-        for attempt in range(retries):
-            try:
-                logger.info(f"Загружаем профиль игрока (попытка {attempt + 1}): {url}")
-                
-                if attempt > 0:
-                    delay = 10 + attempt * 5
-                    logger.info(f"Ждем {delay} секунд перед повторной попыткой...")
-                    time.sleep(delay)
-                
-                # Загружаем страницу игрока
-                logger.info(f"Загружаем страницу игрока: {url}")
-                self.driver.get(url)
-                
-                # Ждем загрузки
-                time.sleep(5 + attempt * 2)
-                
-                # Проверяем заголовок страницы
-                page_title = self.driver.title
-                logger.info(f"Заголовок страницы: {page_title}")
-                
-                # Обрабатываем Cloudflare защиту
-                if "just a moment" in page_title.lower() or "checking your browser" in page_title.lower():
-                    logger.info("Обнаружена защита Cloudflare, ждем прохождения проверки...")
-                    
-                    # Ждем до 60 секунд пока Cloudflare не пропустит
-                    cloudflare_wait = 0
-                    max_cloudflare_wait = 60
-                    
-                    while cloudflare_wait < max_cloudflare_wait:
-                        time.sleep(5)
-                        cloudflare_wait += 5
-                        
-                        current_title = self.driver.title
-                        
-                        # Проверяем, прошли ли мы Cloudflare
-                        if "just a moment" not in current_title.lower() and "checking" not in current_title.lower():
-                            logger.info(f"Cloudflare пройден! Новый заголовок: {current_title}")
-                            page_title = current_title
-                            break
-                            
-                        if cloudflare_wait % 15 == 0:
-                            logger.info(f"Ждем Cloudflare... ({cloudflare_wait}/{max_cloudflare_wait}s)")
-                    
-                    if cloudflare_wait >= max_cloudflare_wait:
-                        logger.warning("Cloudflare не пропустил за отведенное время")
-                        if attempt < retries - 1:
-                            time.sleep(60)
-                            continue
-                        else:
-                            return None
-                
-                # Проверяем на блокировку или ошибки
-                if any(keyword in page_title.lower() for keyword in ["access denied", "403", "forbidden", "blocked"]):
-                    logger.warning(f"Страница заблокирована (попытка {attempt + 1}): {page_title}")
-                    if attempt < retries - 1:
-                        block_delay = 30 + attempt * 15
-                        logger.info(f"Ждем {block_delay} секунд из-за блокировки...")
-                        time.sleep(block_delay)
-                        continue
-                    else:
-                        return None
-                
-                # Получаем HTML
-                html = self.driver.page_source
-                logger.info(f"Страница игрока загружена успешно, размер: {len(html)} символов")
-                
-                # Проверяем качество полученных данных
-                if len(html) < 1000:
-                    logger.warning("Получена подозрительно короткая страница")
-                    if attempt < retries - 1:
-                        continue
-                
-                # Проверяем наличие ключевых элементов HLTV
-                if "hltv" not in html.lower() or "player" not in html.lower():
-                    logger.warning("Страница не содержит ожидаемый контент HLTV")
-                    if attempt < retries - 1:
-                        continue
-                
-                return BeautifulSoup(html, 'html.parser')
-                
-            except Exception as e:
-                logger.error(f"Ошибка при загрузке профиля игрока {url} (попытка {attempt + 1}): {e}")
-                if attempt < retries - 1:
-                    error_delay = 15 + attempt * 5
-                    logger.info(f"Ждем {error_delay} секунд после ошибки...")
-                    time.sleep(error_delay)
-                    continue
-                return None
-        
-        return None
+    def fetch_player_html(self, player_id: int, nickname: str, retries: int = MAX_RETRIES) -> Optional[str]:
+        """Загрузить HTML страницы профиля игрока"""
+        return fetch_player_html(self.page_fetcher, player_id, nickname, driver=self.driver, retries=retries)
     
-    def _extract_basic_info(self, soup: BeautifulSoup, player_id: int) -> Dict[str, Any]:
+    def fetch_stats_listing_html(self, params: Optional[Dict[str, Any]] = None,
+                                 retries: int = MAX_RETRIES) -> Optional[str]:
+        """Загрузить HTML списка статистики игроков /stats/players с фильтрами params"""
+        return fetch_stats_listing_html(self.page_fetcher, params, driver=self.driver, retries=retries)
+    
+    def fetch_team_stats_html(self, team_id: int, slug: str, retries: int = MAX_RETRIES) -> Optional[str]:
+        """Загрузить HTML статистики игроков команды /stats/teams/players/{id}/{slug}"""
+        return fetch_team_stats_html(self.page_fetcher, team_id, slug, driver=self.driver, retries=retries)
+    
+    @classmethod
+    def _extract_basic_info(cls, soup: BeautifulSoup, player_id: int) -> Dict[str, Any]:
         """Извлечь базовую информацию об игроке"""
         player_info = {
             'hltv_id': player_id,
@@ -213,7 +90,7 @@ class PlayerParser:
             'country_code': '',
             'country_name': '',
             'age': None,
-            'hltv_url': f"{self.BASE_URL}/stats/players/{player_id}"
+            'hltv_url': f"{cls.BASE_URL}/stats/players/{player_id}"
         }
         
         try:
@@ -237,7 +114,8 @@ class PlayerParser:
         
         return player_info
     
-    def _extract_statistics(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    @staticmethod
+    def _extract_statistics(soup: BeautifulSoup) -> Dict[str, Any]:
         """Извлечь игровую статистику игрока"""
         stats = {
             'rating_2_0': None,
@@ -309,128 +187,105 @@ class PlayerParser:
         logger.info(f"Начинаем парсинг игрока: {nickname} (ID: {player_id})")
         
         # Загружаем страницу
-        soup = self._fetch_player_page(player_id, nickname)
-        if not soup:
+        html = self.fetch_player_html(player_id, nickname)
+        if not html:
             logger.error(f"Не удалось загрузить страницу игрока {nickname}")
             return None
         
-        # Извлекаем базовую информацию
-        player_info = self._extract_basic_info(soup, player_id)
-        
-        # Извлекаем статистику
-        stats = self._extract_statistics(soup)
-        
-        # Объединяем данные
-        result = {
-            **player_info,
-            'statistics': stats
-        }
-        
+        started = time.monotonic()
+        result = parse_player_html(html, player_id)
+        metrics.observe_parse('player', time.monotonic() - started, count_player_stats(result))
         logger.info(f"Парсинг игрока {nickname} завершен успешно")
         return result
     
+    def parse_stats_listings(self, listings: Iterable[Dict[str, Any]] = BULK_STATS_LISTINGS) -> Dict[int, Dict[str, Any]]:
+        """
+        Собрать статистику игроков со страниц списка /stats/players.
+
+        Args:
+            listings: параметры запроса каждой страницы (фильтры HLTV).
+
+        Returns:
+            hltv_id -> данные игрока в формате parse_player (только поля, которые есть
+            в списке). Игрок, попавший на несколько страниц, берется с первой.
+        """
+        return collect_stats_listings(self.page_fetcher, listings, driver=self.driver)
+    
+    def refresh_known_players_stats(self, fallback: bool = True) -> int:
+        """
+        Обновить статистику всех активных игроков из БД по спискам /stats/players.
+
+        Страницы игроков загружаются только для тех, кого нет в списке или у кого
+        за текущий месяц нет полей со страницы игрока (см. plan_bulk_stats).
+
+        Args:
+            fallback: загружать страницы таких игроков; False — только список.
+
+        Returns:
+            Количество игроков с обновленной статистикой.
+        """
+        known = dict(self.db.query(Player.hltv_id, Player.nickname).filter(Player.is_active.is_(True)).all())
+        listed = self.parse_stats_listings()
+        bulk, to_fetch = plan_bulk_stats(self.db, listed, known)
+
+        updated = 0
+        if bulk:
+            try:
+                started = time.monotonic()
+                player_ids = resolve_player_ids(self.db, bulk)
+                stats = {player_ids[hltv_id]: bulk[hltv_id]['statistics'] for hltv_id in bulk if hltv_id in player_ids}
+                upsert_player_statistics(self.db, stats)
+                self.db.commit()
+                metrics.observe_db_write('stats', time.monotonic() - started, {'player_statistics': len(stats)})
+                updated += len(stats)
+                logger.info(f"Статистика {len(stats)} игроков обновлена по списку")
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении статистики из списка: {e}")
+                self.db.rollback()
+
+        if fallback:
+            for hltv_id in sorted(to_fetch):
+                if self.stop_event is not None and self.stop_event.is_set():
+                    logger.info("Обновление статистики остановлено")
+                    break
+                player_data = self.parse_player(hltv_id, known[hltv_id])
+                if player_data and hltv_id in listed:
+                    merge_listing_stats(player_data, listed[hltv_id])
+                if player_data and self.save_player_to_database(player_data):
+                    updated += 1
+
+        logger.info(f"Статистика обновлена у {updated} из {len(known)} игроков, страниц игроков: {len(to_fetch) if fallback else 0}")
+        return updated
+    
     def save_player_to_database(self, player_data: Dict[str, Any]) -> bool:
-        """Сохранить данные игрока в базу данных"""
+        """Сохранить данные игрока и его статистику в базу данных"""
         try:
-            # Проверяем существующего игрока
-            existing_player = self.db.query(Player).filter(
-                Player.hltv_id == player_data['hltv_id']
-            ).first()
-            
-            if existing_player:
-                # Обновляем существующего игрока (без полей страны, возраста и аватара)
-                existing_player.nickname = player_data['nickname']
-                existing_player.real_name = player_data['real_name']
-                existing_player.hltv_url = player_data['hltv_url']
-                existing_player.is_active = True
-                
-                player = existing_player
-                logger.info(f"Обновлен игрок: {player_data['nickname']}")
-                
-            else:
-                # Создаем нового игрока
-                player = Player(
-                    hltv_id=player_data['hltv_id'],
-                    nickname=player_data['nickname'],
-                    real_name=player_data['real_name'],
-                    hltv_url=player_data['hltv_url'],
-                    is_active=True
-                )
-                
-                self.db.add(player)
-                logger.info(f"Создан новый игрок: {player_data['nickname']}")
-            
-            self.db.commit()
-            self.db.refresh(player)
+            started = time.monotonic()
+            player_ids = upsert_players(self.db, [player_data])
             
             # Сохраняем статистику
             if player_data.get('statistics'):
-                self._save_player_statistics(player.id, player_data['statistics'])
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении игрока {player_data.get('nickname', 'Unknown')}: {e}")
-            self.db.rollback()
-            return False
-    
-    def _save_player_statistics(self, player_id: int, stats: Dict[str, Any]) -> bool:
-        """Сохранить статистику игрока"""
-        try:
-            # Текущий период (последний месяц)
-            today = date.today()
-            period_start = today.replace(day=1)
-            
-            # Ищем существующую статистику за текущий период
-            existing_stats = self.db.query(PlayerStatistics).filter(
-                PlayerStatistics.player_id == player_id,
-                PlayerStatistics.period_start == period_start
-            ).first()
-            
-            if existing_stats:
-                # Обновляем существующую статистику
-                existing_stats.rating_2_0 = stats.get('rating_2_0')
-                existing_stats.kd_ratio = stats.get('kd_ratio')
-                existing_stats.adr = stats.get('adr')
-                existing_stats.kills_per_round = stats.get('kpr')
-                existing_stats.assists_per_round = stats.get('apr')
-                existing_stats.deaths_per_round = stats.get('dpr')
-                existing_stats.maps_played = stats.get('maps_played', 0)
-                existing_stats.last_updated = datetime.now()
-                
-                logger.info(f"Обновлена статистика игрока ID {player_id}")
-                
-            else:
-                # Создаем новую статистику
-                new_stats = PlayerStatistics(
-                    player_id=player_id,
-                    rating_2_0=stats.get('rating_2_0'),
-                    kd_ratio=stats.get('kd_ratio'),
-                    adr=stats.get('adr'),
-                    kills_per_round=stats.get('kpr'),
-                    assists_per_round=stats.get('apr'),
-                    deaths_per_round=stats.get('dpr'),
-                    maps_played=stats.get('maps_played', 0),
-                    period_start=period_start,
-                    period_end=today,
-                    last_updated=datetime.now()
-                )
-                
-                self.db.add(new_stats)
-                logger.info(f"Создана новая статистика игрока ID {player_id}")
+                upsert_player_statistics(self.db, {player_ids[player_data['hltv_id']]: player_data['statistics']})
             
             self.db.commit()
+            metrics.observe_db_write('player', time.monotonic() - started, {
+                'players': 1,
+                'player_statistics': 1 if player_data.get('statistics') else 0,
+            })
+            logger.info(f"Сохранен игрок: {player_data['nickname']}")
             return True
             
         except Exception as e:
-            logger.error(f"Ошибка при сохранении статистики игрока ID {player_id}: {e}")
+            logger.error(f"Ошибка при сохранении игрока {player_data.get('nickname', 'Unknown')}: {e}")
             self.db.rollback()
             return False
     
     def close(self):
         """Закрыть соединения"""
-        if self.driver:
+        if self.driver and self._owns_driver:
             self.driver.quit()
+        if self._owns_http_fetcher:
+            self.http_fetcher.close()
         if self.db:
             self.db.close()
     
@@ -438,4 +293,179 @@ class PlayerParser:
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close() 
\ No newline at end of file
+        self.close()
+
+
+@metrics.observe_fetch('player')
+def fetch_player_html(page_fetcher: PageFetcher, player_id: int, nickname: str, driver: Optional[WebDriver] = None,
+                      retries: int = MAX_RETRIES) -> Optional[str]:
+    """Загрузить HTML страницы профиля игрока (без парсера и сессии БД — для воркеров пула)"""
+    url = f"{HLTV_BASE_URL}/stats/players/{player_id}/{nickname}"
+    return page_fetcher.fetch(url, 'player', driver=driver, retries=retries)
+
+
+@metrics.observe_fetch('stats')
+def fetch_stats_listing_html(page_fetcher: PageFetcher, params: Optional[Dict[str, Any]] = None,
+                             driver: Optional[WebDriver] = None, retries: int = MAX_RETRIES) -> Optional[str]:
+    """Загрузить HTML списка статистики игроков /stats/players с фильтрами params"""
+    url = f"{HLTV_BASE_URL}/stats/players"
+    if params:
+        url += '?' + urlencode(params)
+    return page_fetcher.fetch(url, 'stats', driver=driver, retries=retries)
+
+
+@metrics.observe_fetch('team_stats')
+def fetch_team_stats_html(page_fetcher: PageFetcher, team_id: int, slug: str, driver: Optional[WebDriver] = None,
+                          retries: int = MAX_RETRIES) -> Optional[str]:
+    """Загрузить HTML статистики игроков команды /stats/teams/players/{id}/{slug}"""
+    url = f"{HLTV_BASE_URL}/stats/teams/players/{team_id}/{slug}"
+    return page_fetcher.fetch(url, 'team_stats', driver=driver, retries=retries)
+
+
+def collect_stats_listings(page_fetcher: PageFetcher, listings: Iterable[Dict[str, Any]] = BULK_STATS_LISTINGS,
+                           driver: Optional[WebDriver] = None) -> Dict[int, Dict[str, Any]]:
+    """Собрать статистику игроков со страниц списка /stats/players (см. PlayerParser.parse_stats_listings)"""
+    players: Dict[int, Dict[str, Any]] = {}
+    for params in listings:
+        html = fetch_stats_listing_html(page_fetcher, params, driver=driver)
+        if not html:
+            logger.warning(f"Не удалось загрузить список статистики игроков ({params})")
+            continue
+
+        started = time.monotonic()
+        listed = parse_stats_listing_html(html)
+        metrics.observe_parse('stats', time.monotonic() - started, len(listed))
+        for hltv_id, player_data in listed.items():
+            players.setdefault(hltv_id, player_data)
+
+    logger.info(f"Со страниц списка статистики получены данные {len(players)} игроков")
+    return players
+
+
+def parse_player_html(html: str, player_id: int) -> Dict[str, Any]:
+    """
+    Извлечь данные игрока из HTML его страницы.
+
+    Функция уровня модуля, чтобы ее можно было выполнять в пуле процессов.
+    """
+    soup = make_soup(html, 'player')
+    
+    # Извлекаем базовую информацию и статистику
+    player_info = PlayerParser._extract_basic_info(soup, player_id)
+    stats = PlayerParser._extract_statistics(soup)
+    
+    # Объединяем данные
+    return {
+        **player_info,
+        'statistics': stats
+    }
+
+
+def count_player_stats(player_data: Dict[str, Any]) -> int:
+    """Количество показателей, найденных на странице игрока (для метрик разбора)"""
+    return sum(1 for value in player_data.get('statistics', {}).values() if value)
+
+
+# Заголовок столбца списка /stats/players (в нижнем регистре, без пробелов) -> поле статистики
+_LISTING_COLUMNS = (
+    (re.compile(r'^maps$'), 'maps_played'),
+    (re.compile(r'^k/d$'), 'kd_ratio'),
+    (re.compile(r'^rating'), 'rating_2_0'),
+    (re.compile(r'^adr$'), 'adr'),
+    (re.compile(r'^kpr$'), 'kpr'),
+    (re.compile(r'^dpr$'), 'dpr'),
+    (re.compile(r'^apr$'), 'apr'),
+    (re.compile(r'^impact$'), 'impact'),
+)
+_LISTING_PLAYER_LINK = re.compile(r'/stats/players/(\d+)/([^/?#]+)')
+
+
+def parse_stats_listing_html(html: str) -> Dict[int, Dict[str, Any]]:
+    """
+    Извлечь статистику игроков из списка /stats/players (или из такой же таблицы
+    на странице статистики игроков команды).
+
+    Столбцы определяются по заголовкам таблицы; показатели, которых в списке нет,
+    остаются None (maps_played — 0), как у незаполненных полей страницы игрока.
+
+    Returns:
+        hltv_id -> данные игрока в формате parse_player_html.
+    """
+    soup = make_soup(html, 'stats')
+    table = soup.find('table', class_='player-ratings-table')
+    if not table:
+        logger.warning("На странице нет таблицы статистики игроков")
+        return {}
+
+    columns: Dict[int, str] = {}
+    for index, header in enumerate(table.find_all('th')):
+        name = header.get_text('', strip=True).lower().replace(' ', '')
+        for pattern, field in _LISTING_COLUMNS:
+            if pattern.match(name) and field not in columns.values():
+                columns[index] = field
+                break
+
+    players: Dict[int, Dict[str, Any]] = {}
+    for row in table.find_all('tr'):
+        cells = row.find_all('td')
+        link = row.find('a', href=_LISTING_PLAYER_LINK)
+        if not cells or not link:
+            continue
+        match = _LISTING_PLAYER_LINK.search(link['href'])
+        hltv_id = int(match.group(1))
+
+        stats: Dict[str, Any] = dict.fromkeys(('rating_2_0', 'impact', 'adr', 'kd_ratio', 'dpr', 'kpr', 'apr'))
+        stats['maps_played'] = 0
+        for index, field in columns.items():
+            if index >= len(cells):
+                continue
+            value = cells[index].get_text(strip=True)
+            try:
+                stats[field] = int(value) if field == 'maps_played' else float(value)
+            except ValueError:
+                logger.debug(f"Не удалось обработать значение '{value}' ({field}) игрока {hltv_id}")
+
+        players[hltv_id] = {
+            'hltv_id': hltv_id,
+            'nickname': link.get_text(strip=True) or match.group(2),
+            'real_name': '',
+            'country_code': '',
+            'country_name': '',
+            'age': None,
+            'hltv_url': f"{PlayerParser.BASE_URL}/stats/players/{hltv_id}",
+            'statistics': stats,
+        }
+
+    logger.info(f"В списке статистики найдено {len(players)} игроков, столбцы: {sorted(columns.values())}")
+    return players
+
+
+def merge_listing_stats(player_data: Dict[str, Any], listed_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Дополнить статистику со страницы игрока полями из списка, которых на странице не нашлось"""
+    statistics = player_data.setdefault('statistics', {})
+    for field, value in listed_data['statistics'].items():
+        if value and not statistics.get(field):
+            statistics[field] = value
+    return player_data
+
+
+def plan_bulk_stats(db, listed: Dict[int, Dict[str, Any]], hltv_ids: Iterable[int],
+                    required_fields: Iterable[str] = BULK_STATS_REQUIRED_FIELDS,
+                    page_fields: Iterable[str] = BULK_STATS_PAGE_FIELDS) -> Tuple[Dict[int, Dict[str, Any]], Set[int]]:
+    """
+    Разделить игроков на обновляемых по списку /stats/players и загружаемых со своей страницы.
+
+    Страница игрока нужна, если его нет в списке, в списке нет required_fields или
+    за текущий месяц в БД еще нет page_fields (полей, которых в списке нет).
+
+    Returns:
+        (hltv_id -> данные из списка, множество hltv_id для загрузки страниц)
+    """
+    hltv_ids = set(hltv_ids)
+    complete = {
+        hltv_id for hltv_id in hltv_ids & listed.keys()
+        if all(listed[hltv_id]['statistics'].get(field) is not None for field in required_fields)
+    }
+    complete -= find_players_missing_statistics(db, complete, page_fields)
+    logger.info(f"Статистика по списку: {len(complete)} игроков, со страниц игроков: {len(hltv_ids - complete)}")
+    return {hltv_id: listed[hltv_id] for hltv_id in complete}, hltv_ids - complete
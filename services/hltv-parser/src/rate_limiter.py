@@ -0,0 +1,115 @@
+"""
+Request rate limiting for HLTV Parser
+Ограничение частоты запросов к HLTV.org
+"""
+
+import time
+import random
+import threading
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from config.settings import REQUEST_DELAY, RATE_LIMIT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием.
+
+    Каждый запрос забирает один токен; если токенов нет, запрос уходит "в долг" и
+    ждет, пока долг не восполнится. Так параллельные запросы выстраиваются в очередь
+    без активного ожидания.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Забрать токен и вернуть, сколько секунд нужно подождать"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def drain(self) -> None:
+        """Сбросить накопленный запас токенов"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 0.0)
+
+
+class RateLimiter:
+    """
+    Адаптивный ограничитель частоты запросов, общий для всех потоков.
+
+    - у каждого хоста свой token bucket (начальная скорость 1 / REQUEST_DELAY);
+    - на чистых ответах скорость понемногу растет до ``max_rate``;
+    - на блокировках и проверках Cloudflare скорость падает вдвое до ``min_rate``;
+    - задержка перед повтором — экспоненциальная с джиттером или из Retry-After (``backoff``).
+
+    Ожидания прерываются установкой ``stop_event`` (остановка демона): ``wait`` и
+    ``backoff`` сразу возвращаются, а вызывающий код проверяет событие сам.
+    """
+
+    def __init__(self, min_interval: float = REQUEST_DELAY, config: Dict[str, float] = RATE_LIMIT_CONFIG,
+                 stop_event: Optional[threading.Event] = None):
+        self.base_rate = 1.0 / min_interval
+        self.min_rate = config['min_rate']
+        self.max_rate = config['max_rate']
+        self.burst = config['burst']
+        self.speedup = config['speedup']
+        self.backoff_base = config['backoff_base']
+        self.backoff_max = config['backoff_max']
+        self.stop_event = stop_event or threading.Event()
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.base_rate, self.burst)
+        return bucket
+
+    def wait(self, url: str) -> None:
+        """Дождаться разрешения на запрос к хосту url"""
+        with self._lock:
+            delay = self._bucket(url).reserve()
+        if delay > 0:
+            self.stop_event.wait(delay)
+
+    def report_success(self, url: str) -> None:
+        """Ответ без блокировки: немного ускоряемся"""
+        with self._lock:
+            bucket = self._bucket(url)
+            bucket.rate = min(self.max_rate, bucket.rate * self.speedup)
+
+    def report_blocked(self, url: str) -> None:
+        """Блокировка или проверка Cloudflare: замедляемся вдвое"""
+        with self._lock:
+            bucket = self._bucket(url)
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+            bucket.drain()
+            rate = bucket.rate
+        logger.info(f"HLTV ограничивает запросы, снижаем частоту до {rate:.2f} запр/с")
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Подождать перед повтором: экспоненциальная задержка с джиттером или указанная
+        сервером (Retry-After, не больше backoff_max). Возвращает задержку.
+        """
+        if retry_after is not None:
+            delay = min(self.backoff_max, retry_after)
+        else:
+            delay = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+        logger.info(f"Ждем {delay:.1f} секунд перед повторной попыткой...")
+        self.stop_event.wait(delay)
+        return delay
@@ -0,0 +1,87 @@
+"""
+Incremental player refresh planning
+Выбор игроков, статистику которых нужно перезагрузить с HLTV
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Any
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from config.settings import PARSING_CONFIG
+from database import Team, Player, TeamRoster, PlayerStatistics
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshPlanner:
+    """
+    Планировщик инкрементального обновления игроков.
+
+    Игрок загружается заново, если:
+      - его статистика старше ``max_age`` (или ее нет);
+      - его команда новая или сменила место в рейтинге;
+      - он впервые появился в активном составе команды.
+    Все проверки выполняются тремя запросами на весь рейтинг.
+    """
+
+    def __init__(self, db: Session, max_age: timedelta = timedelta(seconds=PARSING_CONFIG['player_stats_max_age'])):
+        self.db = db
+        self.max_age = max_age
+        self.skipped = 0
+
+    def plan(self, teams: List[Dict[str, Any]]) -> Set[int]:
+        """
+        Выбрать игроков для загрузки.
+
+        Args:
+            teams: команды из TeamParser._extract_team_info (rank, hltv_id, players).
+
+        Returns:
+            Множество hltv_id игроков, которых нужно загрузить.
+        """
+        team_hltv_ids = [t['hltv_id'] for t in teams if t.get('hltv_id')]
+        player_hltv_ids = {p['id'] for t in teams for p in t.get('players', [])}
+        if not player_hltv_ids:
+            return set()
+
+        rankings: Dict[int, int] = dict(
+            self.db.query(Team.hltv_id, Team.world_ranking).filter(Team.hltv_id.in_(team_hltv_ids)).all()
+        )
+
+        active_rosters: Set[tuple] = set(
+            self.db.query(Team.hltv_id, Player.hltv_id)
+            .join(TeamRoster, TeamRoster.team_id == Team.id)
+            .join(Player, Player.id == TeamRoster.player_id)
+            .filter(Team.hltv_id.in_(team_hltv_ids), TeamRoster.left_at.is_(None))
+            .all()
+        )
+
+        last_updated: Dict[int, datetime] = dict(
+            self.db.query(Player.hltv_id, func.max(PlayerStatistics.last_updated))
+            .join(PlayerStatistics, PlayerStatistics.player_id == Player.id)
+            .filter(Player.hltv_id.in_(list(player_hltv_ids)))
+            .group_by(Player.hltv_id)
+            .all()
+        )
+
+        cutoff = datetime.now() - self.max_age
+        to_fetch: Set[int] = set()
+        for team in teams:
+            team_moved = rankings.get(team.get('hltv_id')) != (team.get('rank') or 0)
+            for player in team.get('players', []):
+                updated = last_updated.get(player['id'])
+                if (team_moved
+                        or (team.get('hltv_id'), player['id']) not in active_rosters
+                        or updated is None
+                        or updated < cutoff):
+                    to_fetch.add(player['id'])
+
+        self.skipped = len(player_hltv_ids - to_fetch)
+        logger.info(
+            f"План обновления игроков: загрузить {len(to_fetch)}, пропустить {self.skipped} "
+            f"из {len(player_hltv_ids)} (статистика свежее {self.max_age})"
+        )
+        return to_fetch
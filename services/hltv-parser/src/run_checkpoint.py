@@ -0,0 +1,74 @@
+"""
+Durable progress checkpoints for long parsing runs
+Контрольная точка прогона: какие команды и игроки уже записаны в БД
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Iterable, Set
+
+from config.settings import CHECKPOINT_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class RunCheckpoint:
+    """
+    Прогресс прогона в JSON файле ``<CHECKPOINT_DIR>/<key>.json``.
+
+    Отмечаются только записанные (закоммиченные) команды и игроки, поэтому после
+    падения повторный запуск с тем же ключом пропускает их и продолжает с места
+    остановки. После успешного завершения прогона файл удаляется.
+    """
+
+    def __init__(self, key: str, directory: str = CHECKPOINT_DIR):
+        self.key = key
+        self.path = os.path.join(directory, f"{key}.json")
+        self._lock = threading.Lock()
+        self.done_teams: Set[int] = set()
+        self.done_players: Set[int] = set()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать контрольную точку {self.path}: {e}")
+            return
+        self.done_teams = set(data.get('teams', []))
+        self.done_players = set(data.get('players', []))
+        logger.info(
+            f"Продолжаем прогон {self.key}: уже записано {len(self.done_teams)} команд "
+            f"и {len(self.done_players)} игроков"
+        )
+
+    def mark(self, teams: Iterable[int] = (), players: Iterable[int] = ()) -> None:
+        """Отметить команды и игроков как записанные и сохранить файл"""
+        with self._lock:
+            self.done_teams.update(teams)
+            self.done_players.update(players)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'teams': sorted(self.done_teams), 'players': sorted(self.done_players)}, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Не удалось сохранить контрольную точку {self.path}: {e}")
+
+    def clear(self) -> None:
+        """Удалить контрольную точку после успешного прогона"""
+        with self._lock:
+            self.done_teams.clear()
+            self.done_players.clear()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Не удалось удалить контрольную точку {self.path}: {e}")
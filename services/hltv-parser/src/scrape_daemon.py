@@ -0,0 +1,245 @@
+"""
+Long-running scraper daemon
+Демон парсера: задачи рейтинга, игроков и матчей по расписанию на общем пуле браузеров
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import schedule
+
+from config.settings import DAEMON_JOBS, DAEMON_MAX_TEAMS, DAEMON_RUN_ON_START, DAEMON_STOP_TIMEOUT, DRIVER_POOL_SIZE
+from cookie_store import CookieStore
+from driver_pool import DriverPool
+from http_fetcher import HttpFetcher
+from match_parser import MatchParser
+from page_cache import PageCache
+from player_parser import PlayerParser
+from rate_limiter import RateLimiter
+from team_parser import TeamParser
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeDaemon:
+    """
+    Держит ресурсы парсеров прогретыми и запускает задачи по расписанию (``schedule``).
+
+    Пул Firefox (с пройденной проверкой Cloudflare), HTTP сессия, кэш страниц,
+    ограничитель частоты и пул соединений SQLAlchemy создаются один раз и
+    переиспользуются всеми запусками, поэтому частая задача (например, матчи раз в
+    несколько минут) не платит за запуск браузера и установку соединений.
+
+    Каждая задача выполняется в своем потоке: долгий прогон рейтинга не задерживает
+    обновление матчей, а драйверы распределяет пул. Задача не запускается повторно,
+    пока не завершился ее предыдущий запуск. Ошибка задачи записывается в ее
+    состояние (``status()``) и не останавливает демон.
+
+    ``stop()`` передается задачам как событие остановки: задачи перестают загружать
+    страницы (ожидания ограничителя частоты и проверки Cloudflare прерываются),
+    записывают полученное, а прогон рейтинга оставляет контрольную точку
+    (``RunCheckpoint``), с которой продолжит следующий запуск. ``run()`` ждет задачи не
+    дольше ``stop_timeout`` секунд; не успевшие задачи прерываются в ``close()``
+    закрытием их драйверов без ожидания.
+    """
+
+    def __init__(self, intervals: Optional[Dict[str, int]] = None, pool_size: int = DRIVER_POOL_SIZE,
+                 max_teams: int = DAEMON_MAX_TEAMS, driver_pool: Optional[DriverPool] = None,
+                 stop_timeout: float = DAEMON_STOP_TIMEOUT):
+        """Создать демон.
+
+        :param intervals: интервалы задач в минутах (ranking, players, matches); 0 — задача отключена.
+        :param pool_size: количество Firefox в общем пуле.
+        :param max_teams: сколько команд рейтинга обрабатывает задача ranking.
+        :param driver_pool: готовый пул драйверов (иначе создается пул из pool_size).
+        :param stop_timeout: сколько секунд после stop() ждать выполняющиеся задачи.
+        """
+        self.intervals = dict(DAEMON_JOBS if intervals is None else intervals)
+        self.max_teams = max_teams
+        self.stop_timeout = stop_timeout
+
+        self._stop = threading.Event()
+        self.rate_limiter = RateLimiter(stop_event=self._stop)
+        self.page_cache = PageCache()
+        self.cookie_store = CookieStore()
+        self.http_fetcher = HttpFetcher(page_cache=self.page_cache, cookie_store=self.cookie_store)
+        self.driver_pool = driver_pool or DriverPool(pool_size, cookie_store=self.cookie_store)
+
+        self.jobs: Dict[str, Callable[[], Any]] = {
+            'ranking': self.run_ranking,
+            'players': self.run_players,
+            'matches': self.run_matches,
+        }
+        self.scheduler = schedule.Scheduler()
+        self.started_at = datetime.now()
+        self._lock = threading.Lock()
+        self._threads: Dict[str, threading.Thread] = {}
+        self._state: Dict[str, Dict[str, Any]] = {
+            name: {
+                'interval_minutes': self.intervals.get(name, 0),
+                'running': False,
+                'runs': 0,
+                'failures': 0,
+                'last_started_at': None,
+                'last_finished_at': None,
+                'last_duration_seconds': None,
+                'last_result': None,
+                'last_error': None,
+            }
+            for name in self.jobs
+        }
+
+    # ---- Задачи --------------------------------------------------------------
+
+    def run_ranking(self) -> str:
+        """Рейтинг команд, составы и статистика игроков"""
+        with TeamParser(driver_pool=self.driver_pool, rate_limiter=self.rate_limiter,
+                        http_fetcher=self.http_fetcher, page_cache=self.page_cache,
+                        stop_event=self._stop) as parser:
+            teams = parser.parse_team_ranking(max_teams=self.max_teams)
+        return f"команд: {len(teams)}"
+
+    def run_players(self) -> str:
+        """Статистика всех активных игроков из БД"""
+        with self.driver_pool.driver() as driver:
+            with PlayerParser(driver=driver, rate_limiter=self.rate_limiter,
+                              http_fetcher=self.http_fetcher, page_cache=self.page_cache,
+                              stop_event=self._stop) as parser:
+                updated = parser.refresh_known_players_stats()
+        return f"игроков: {updated}"
+
+    def run_matches(self) -> str:
+        """Предстоящие матчи известных команд"""
+        with self.driver_pool.driver() as driver:
+            with MatchParser(driver, http_fetcher=self.http_fetcher, page_cache=self.page_cache,
+                             rate_limiter=self.rate_limiter, stop_event=self._stop) as parser:
+                parser.parse_and_save_upcoming_matches()
+        return "ok"
+
+    # ---- Запуск задач --------------------------------------------------------
+
+    def trigger(self, name: str) -> bool:
+        """
+        Запустить задачу в отдельном потоке.
+
+        Returns:
+            False, если предыдущий запуск задачи еще не завершился.
+        """
+        with self._lock:
+            thread = self._threads.get(name)
+            if thread is not None and thread.is_alive():
+                logger.warning(f"Задача {name} еще выполняется, запуск пропущен")
+                return False
+            self._state[name]['running'] = True
+            thread = threading.Thread(target=self._execute, args=(name,), name=f"job-{name}", daemon=True)
+            self._threads[name] = thread
+        thread.start()
+        return True
+
+    def _execute(self, name: str) -> None:
+        state = self._state[name]
+        started = time.monotonic()
+        with self._lock:
+            state['last_started_at'] = datetime.now().isoformat(timespec='seconds')
+        logger.info(f"Задача {name} запущена")
+        result, error = None, None
+        try:
+            result = self.jobs[name]()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.exception(f"Задача {name} завершилась ошибкой: {e}")
+
+        duration = time.monotonic() - started
+        with self._lock:
+            state['running'] = False
+            state['runs'] += 1
+            state['last_finished_at'] = datetime.now().isoformat(timespec='seconds')
+            state['last_duration_seconds'] = round(duration, 1)
+            state['last_result'] = result
+            state['last_error'] = error
+            if error:
+                state['failures'] += 1
+        if not error:
+            logger.info(f"Задача {name} выполнена за {duration:.1f} с ({result})")
+
+    def status(self) -> Dict[str, Any]:
+        """Состояние демона и задач (для HTTP эндпоинта /status)"""
+        next_runs = {
+            next(iter(job.tags)): job.next_run.isoformat(timespec='seconds')
+            for job in self.scheduler.get_jobs() if job.tags and job.next_run
+        }
+        with self._lock:
+            jobs = {name: {**state, 'next_run_at': next_runs.get(name)} for name, state in self._state.items()}
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'uptime_seconds': round((datetime.now() - self.started_at).total_seconds()),
+            'jobs': jobs,
+        }
+
+    def add_routes(self, app) -> None:
+        """Эндпоинты демона: состояние задач и ручной запуск задачи"""
+        from fastapi import HTTPException
+
+        @app.get('/status')
+        def status() -> Dict[str, Any]:
+            return self.status()
+
+        @app.get('/health')
+        def health() -> Dict[str, Any]:
+            if self._stop.is_set():
+                raise HTTPException(status_code=503, detail='stopping')
+            return {'status': 'ok'}
+
+        @app.post('/jobs/{name}/run')
+        def run_job(name: str) -> Dict[str, Any]:
+            if name not in self.jobs:
+                raise HTTPException(status_code=404, detail=f'unknown job {name}')
+            if not self.trigger(name):
+                raise HTTPException(status_code=409, detail=f'job {name} is already running')
+            return {'job': name, 'started': True}
+
+    # ---- Основной цикл -------------------------------------------------------
+
+    def run(self) -> None:
+        """Выполнять задачи по расписанию до вызова stop()"""
+        for name, minutes in self.intervals.items():
+            if name not in self.jobs:
+                logger.warning(f"Неизвестная задача в расписании: {name}")
+            elif minutes > 0:
+                self.scheduler.every(minutes).minutes.do(self.trigger, name).tag(name)
+                logger.info(f"Задача {name}: каждые {minutes} мин")
+        if DAEMON_RUN_ON_START:
+            for job in self.scheduler.get_jobs():
+                job.run()
+
+        while not self._stop.is_set():
+            self.scheduler.run_pending()
+            idle = self.scheduler.idle_seconds
+            self._stop.wait(min(max(idle if idle is not None else 60, 1), 60))
+
+        logger.info(f"Останавливаем выполняющиеся задачи (не дольше {self.stop_timeout} с)...")
+        deadline = time.monotonic() + self.stop_timeout
+        for name, thread in list(self._threads.items()):
+            thread.join(max(deadline - time.monotonic(), 0))
+            if thread.is_alive():
+                logger.warning(f"Задача {name} не завершилась за {self.stop_timeout} с, закрываем ее драйверы")
+
+    def stop(self) -> None:
+        """Остановить основной цикл и задачи на ближайшей контрольной точке"""
+        self._stop.set()
+
+    def close(self) -> None:
+        """Закрыть пул драйверов и HTTP сессию (не дожидаясь задач, не успевших остановиться)"""
+        self.scheduler.clear()
+        running = any(thread.is_alive() for thread in self._threads.values())
+        self.driver_pool.close(wait=not running)
+        self.http_fetcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -6,126 +6,93 @@ HLTV Team Ranking Parser
 import re
 import time
 import logging
+import threading
 from typing import Dict, List, Optional, Any, Tuple
-from datetime import datetime, date, timedelta
+from datetime import date, timedelta
 import calendar
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.firefox.service import Service as FirefoxService
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import geckodriver_autoinstaller
+from selenium.webdriver.firefox.webdriver import WebDriver
 from bs4 import BeautifulSoup
 
-from database import SessionLocal, Team, Player, TeamRoster
-from player_parser import PlayerParser
+from config.settings import (
+    HLTV_BASE_URL, MAX_RETRIES, DRIVER_POOL_SIZE, DB_BATCH_SIZE, PARSE_WORKERS, PIPELINE_QUEUE_SIZE, BULK_PLAYER_STATS,
+    TEAM_STATS_PAGES,
+)
+from cookie_store import CookieStore
+from database import SessionLocal, BatchWriter
+from driver_pool import DriverPool
+import metrics
+from http_fetcher import HttpFetcher
+from page_cache import PageCache
+from page_fetcher import PageFetcher
+from page_parsing import make_soup
+from player_parser import (
+    parse_player_html, parse_stats_listing_html, count_player_stats, plan_bulk_stats, merge_listing_stats,
+    fetch_player_html, fetch_team_stats_html, collect_stats_listings,
+)
+from pipeline import ScrapePipeline
+from refresh_planner import RefreshPlanner
+from run_checkpoint import RunCheckpoint
+from rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
 
+def _parse_player_page(html: str, player_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Разобрать страницу игрока (стадия parse конвейера, выполняется в отдельном процессе)"""
+    return parse_player_html(html, player_info['id'])
+
+
+def _parse_team_stats_page(html: str, team_data: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+    """Разобрать статистику игроков команды (стадия parse конвейера, выполняется в отдельном процессе)"""
+    return parse_stats_listing_html(html)
+
+
 class TeamParser:
     """Парсер рейтинга команд с HLTV.org"""
     
-    BASE_URL = "https://www.hltv.org"
+    BASE_URL = HLTV_BASE_URL
     
-    def __init__(self):
-        self.driver = None
+    def __init__(self, pool_size: int = DRIVER_POOL_SIZE, driver_pool: Optional[DriverPool] = None,
+                 rate_limiter: Optional[RateLimiter] = None, http_fetcher: Optional[HttpFetcher] = None,
+                 page_cache: Optional[PageCache] = None, stop_event: Optional[threading.Event] = None):
+        """Создать парсер.
+
+        :param pool_size: количество параллельных Firefox для загрузки страниц игроков.
+        :param driver_pool: готовый пул драйверов. Если None — парсер создает собственный
+            пул из pool_size драйверов и закрывает его в close().
+        :param rate_limiter: общий ограничитель частоты запросов к HLTV.
+        :param http_fetcher: общая HTTP сессия; если None — парсер создает свою и закрывает ее в close().
+        :param page_cache: дисковый кэш загруженных страниц.
+        :param stop_event: если установлен, прогон рейтинга прекращает загрузку страниц,
+            записывает уже полученное и оставляет контрольную точку для продолжения.
+        """
+        self.stop_event = stop_event
         self.db = SessionLocal()
-        self.player_parser = None
-        self._init_driver()
-    
-    def _init_driver(self):
-        """Инициализация headless Firefox драйвера с обходом защиты от ботов"""
-        try:
-            logger.info("Инициализируем stealth Firefox для парсера команд...")
-            
-            # Автоматически устанавливаем geckodriver и получаем путь
-            geckodriver_path = geckodriver_autoinstaller.install()
-            
-            firefox_options = Options()
-            firefox_options.add_argument("--headless")
-            firefox_options.add_argument("--no-sandbox")
-            firefox_options.add_argument("--disable-dev-shm-usage")
-            firefox_options.add_argument("--window-size=1920,1080")
-            
-            # Настраиваем профиль Firefox для обхода детекции ботов
-            firefox_profile = webdriver.FirefoxProfile()
-            
-            # Стандартный User-Agent
-            user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0"
-            firefox_profile.set_preference("general.useragent.override", user_agent)
-            logger.info(f"Используем User-Agent: {user_agent}")
-            
-            # Загружаем изображения для более реалистичного поведения
-            firefox_profile.set_preference("permissions.default.image", 1)
-            
-            # Настройки для обхода детекции веб-драйвера
-            firefox_profile.set_preference("dom.webdriver.enabled", False)
-            firefox_profile.set_preference("useAutomationExtension", False)
-            firefox_profile.set_preference("marionette.enabled", False)
-            
-            # Отключаем автоматизацию в navigator
-            firefox_profile.set_preference("dom.disable_beforeunload", True)
-            firefox_profile.set_preference("dom.successive_dialog_time_limit", 0)
-            
-            # Настройки для имитации реального браузера
-            firefox_profile.set_preference("network.http.connection-retry-timeout", 0)
-            firefox_profile.set_preference("network.http.connection-timeout", 90)
-            firefox_profile.set_preference("network.http.response.timeout", 90)
-            
-            # Включаем JavaScript (нужен для HLTV)
-            firefox_profile.set_preference("javascript.enabled", True)
-            
-            # Настройки приватности
-            firefox_profile.set_preference("privacy.trackingprotection.enabled", False)
-            firefox_profile.set_preference("network.cookie.cookieBehavior", 0)
-            
-            # Языковые настройки
-            firefox_profile.set_preference("intl.accept_languages", "en-US,en;q=0.9")
-            
-            # Дополнительные настройки для обхода детекции
-            firefox_profile.set_preference("media.peerconnection.enabled", False)
-            firefox_profile.set_preference("media.navigator.enabled", False)
-            firefox_profile.set_preference("webgl.disabled", True)
-            firefox_profile.set_preference("media.autoplay.default", 0)
-            
-            # Настройки времени загрузки
-            firefox_profile.set_preference("network.http.connection-timeout", 120)
-            firefox_profile.set_preference("network.http.response.timeout", 120)
-            
-            firefox_options.profile = firefox_profile
-            
-            service = FirefoxService(executable_path=geckodriver_path)
-            self.driver = webdriver.Firefox(service=service, options=firefox_options)
-            self.driver.set_page_load_timeout(60)  # Увеличиваем таймаут
-            self.driver.implicitly_wait(15)
-            
-            # Устанавливаем размер окна для имитации реального браузера
-            self.driver.set_window_size(1920, 1080)
-            
-            # Выполняем JavaScript для дополнительного сокрытия автоматизации
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            
-            logger.info("Stealth Firefox для парсера команд инициализирован успешно")
-            
-        except Exception as e:
-            logger.error(f"Ошибка инициализации Firefox драйвера: {e}")
-            raise
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.page_cache = page_cache or PageCache()
+        self.cookie_store = CookieStore()
+        self._owns_http_fetcher = http_fetcher is None
+        self.http_fetcher = http_fetcher or HttpFetcher(page_cache=self.page_cache, cookie_store=self.cookie_store)
+        self._owns_driver_pool = driver_pool is None
+        self.driver_pool = driver_pool or DriverPool(pool_size, cookie_store=self.cookie_store)
+        self.page_fetcher = PageFetcher(self.rate_limiter, self.http_fetcher, self.page_cache, self.driver_pool,
+                                        stop_event=stop_event)
     
-    def _get_last_monday_date(self) -> Tuple[int, str, int]:
-        """Получить дату последнего понедельника для URL рейтинга"""
+    def _get_last_monday(self) -> date:
+        """Дата последнего понедельника (дата публикации рейтинга)"""
         today = date.today()
         
         # Находим последний понедельник
         days_since_monday = today.weekday()  # 0 = понедельник
         if days_since_monday == 0:
             # Сегодня понедельник
-            last_monday = today
-        else:
-            # Вычисляем предыдущий понедельник
-            last_monday = today - timedelta(days=days_since_monday)
+            return today
+        # Вычисляем предыдущий понедельник
+        return today - timedelta(days=days_since_monday)
+    
+    def _get_last_monday_date(self) -> Tuple[int, str, int]:
+        """Получить дату последнего понедельника для URL рейтинга"""
+        last_monday = self._get_last_monday()
         
         year = last_monday.year
         month = calendar.month_name[last_monday.month].lower()
@@ -134,105 +101,16 @@ class TeamParser:
         logger.info(f"Последний понедельник: {year}/{month}/{day}")
         return year, month, day
     
-    def _fetch_ranking_page(self, retries: int = 3) -> Optional[BeautifulSoup]:
-        """Загрузить страницу рейтинга команд с имитацией человеческого поведения"""
+    @metrics.observe_fetch('ranking')
+    def _fetch_ranking_page(self, retries: int = MAX_RETRIES) -> Optional[BeautifulSoup]:
+        """Загрузить страницу рейтинга команд (браузер — из пула драйверов)"""
         year, month, day = self._get_last_monday_date()
         url = f"{self.BASE_URL}/ranking/teams/{year}/{month}/{day}"
-        
-        for attempt in range(retries):
-            try:
-                logger.info(f"Загружаем рейтинг команд (попытка {attempt + 1}): {url}")
-                
-                if attempt > 0:
-                    delay = 15 + attempt * 10
-                    logger.info(f"Ждем {delay} секунд перед повторной попыткой...")
-                    time.sleep(delay)
-                
-                # Загружаем страницу рейтинга
-                logger.info(f"Загружаем страницу рейтинга: {url}")
-                self.driver.get(url)
-                
-                # Ждем загрузки
-                loading_delay = 8 + attempt * 3
-                logger.info(f"Ждем загрузки {loading_delay} секунд...")
-                time.sleep(loading_delay)
-                
-                # Проверяем заголовок страницы
-                page_title = self.driver.title
-                logger.info(f"Заголовок страницы: {page_title}")
-                
-                # Обрабатываем Cloudflare защиту
-                if "just a moment" in page_title.lower() or "checking your browser" in page_title.lower():
-                    logger.info("Обнаружена защита Cloudflare, ждем прохождения проверки...")
-                    
-                    # Ждем до 60 секунд пока Cloudflare не пропустит
-                    cloudflare_wait = 0
-                    max_cloudflare_wait = 60
-                    
-                    while cloudflare_wait < max_cloudflare_wait:
-                        time.sleep(5)
-                        cloudflare_wait += 5
-                        
-                        current_title = self.driver.title
-                        
-                        # Проверяем, прошли ли мы Cloudflare
-                        if "just a moment" not in current_title.lower() and "checking" not in current_title.lower():
-                            logger.info(f"Cloudflare пройден! Новый заголовок: {current_title}")
-                            page_title = current_title
-                            break
-                            
-                        if cloudflare_wait % 15 == 0:
-                            logger.info(f"Ждем Cloudflare... ({cloudflare_wait}/{max_cloudflare_wait}s)")
-                    
-                    if cloudflare_wait >= max_cloudflare_wait:
-                        logger.warning("Cloudflare не пропустил за отведенное время")
-                        if attempt < retries - 1:
-                            time.sleep(60)
-                            continue
-                        else:
-                            return None
-                
-                # Проверяем на блокировку или ошибки
-                if any(keyword in page_title.lower() for keyword in ["access denied", "403", "forbidden", "blocked"]):
-                    logger.warning(f"Страница заблокирована (попытка {attempt + 1}): {page_title}")
-                    if attempt < retries - 1:
-                        block_delay = 45 + attempt * 20
-                        logger.info(f"Ждем {block_delay} секунд из-за блокировки...")
-                        time.sleep(block_delay)
-                        continue
-                    else:
-                        return None
-                
-                # Получаем HTML
-                html = self.driver.page_source
-                logger.info(f"Страница рейтинга загружена успешно, размер: {len(html)} символов")
-                
-                # Проверяем качество полученных данных
-                if len(html) < 1000:
-                    logger.warning("Получена подозрительно короткая страница")
-                    if attempt < retries - 1:
-                        continue
-                
-                # Проверяем наличие ключевых элементов HLTV
-                if "hltv" not in html.lower() or "ranking" not in html.lower():
-                    logger.warning("Страница не содержит ожидаемый контент рейтинга HLTV")
-                    if attempt < retries - 1:
-                        continue
-                
-                return BeautifulSoup(html, 'html.parser')
-                
-            except Exception as e:
-                logger.error(f"Ошибка при загрузке рейтинга команд {url} (попытка {attempt + 1}): {e}")
-                if attempt < retries - 1:
-                    error_delay = 20 + attempt * 10
-                    logger.info(f"Ждем {error_delay} секунд после ошибки...")
-                    time.sleep(error_delay)
-                    continue
-                return None
-        
-        return None
+        html = self.page_fetcher.fetch(url, 'ranking', retries=retries)
+        return make_soup(html, 'ranking') if html else None
     
-    def _extract_team_info(self, team_row) -> Optional[Dict[str, Any]]:
+    @classmethod
+    def _extract_team_info(cls, team_row) -> Optional[Dict[str, Any]]:
         """Извлечь информацию о команде из строки таблицы"""
         try:
             team_info = {
@@ -268,7 +146,7 @@ class TeamParser:
                 team_link_tag = more_div.find('a', href=re.compile(r'/team/\d+'))
 
             if team_link_tag and 'href' in team_link_tag.attrs:
-                team_info['hltv_url'] = self.BASE_URL + team_link_tag['href']
+                team_info['hltv_url'] = cls.BASE_URL + team_link_tag['href']
                 id_match = re.search(r'/team/(\d+)/', team_info['hltv_url'])
                 if id_match:
                     team_info['hltv_id'] = int(id_match.group(1))
@@ -278,8 +156,8 @@ class TeamParser:
             for player_elem in player_elements:
                 link = player_elem.find('a')
                 if link and 'href' in link.attrs:
-                    player_url = self.BASE_URL + link['href']
-                    player_id, nickname = self._extract_player_id_and_nickname(player_url)
+                    player_url = cls.BASE_URL + link['href']
+                    player_id, nickname = cls._extract_player_id_and_nickname(player_url)
                     if player_id and nickname:
                         team_info['players'].append({'id': player_id, 'nickname': nickname, 'url': player_url})
 
@@ -289,7 +167,8 @@ class TeamParser:
             logger.error(f"Ошибка при извлечении информации о команде: {e}")
             return None
     
-    def _extract_player_id_and_nickname(self, player_url: str) -> Optional[Tuple[int, str]]:
+    @staticmethod
+    def _extract_player_id_and_nickname(player_url: str) -> Optional[Tuple[int, str]]:
         """Извлечь ID и никнейм игрока из URL"""
         try:
             # URL формата: https://www.hltv.org/player/20425/r1nkle
@@ -303,15 +182,29 @@ class TeamParser:
             logger.error(f"Ошибка при извлечении ID игрока из URL {player_url}: {e}")
             return None
     
-    def parse_team_ranking(self, max_teams: int = 30) -> List[Dict[str, Any]]:
+    def parse_team_ranking(self, max_teams: int = 30, full_refresh: bool = False,
+                           resume: bool = True, bulk_stats: bool = BULK_PLAYER_STATS,
+                           team_stats: bool = TEAM_STATS_PAGES) -> List[Dict[str, Any]]:
         """
         Парсить мировой рейтинг команд и информацию об игроках в них.
         
         Args:
             max_teams (int): Максимальное количество команд для парсинга.
+            full_refresh (bool): Загрузить всех игроков, а не только устаревших
+                (см. RefreshPlanner).
+            resume (bool): Продолжить прерванный прогон того же рейтинга: команды и
+                игроки, записанные до падения, пропускаются (см. RunCheckpoint).
+            bulk_stats (bool): Брать статистику игроков со страниц списка /stats/players,
+                загружая страницы только тех игроков, которых там нет (см. plan_bulk_stats).
+            team_stats (bool): Для оставшихся игроков брать статистику со страницы
+                статистики команды — одна загрузка на состав; страницы игроков
+                загружаются только для тех, кого нет и там.
         
         Returns:
-            List[Dict[str, Any]]: Список словарей с данными команд.
+            List[Dict[str, Any]]: Список словарей с данными команд. Команды и игроки
+            уже записаны в БД; у каждой команды полный состав со страницы рейтинга —
+            в ``roster`` (hltv_id игроков), а в ``players`` — игроки, загруженные в этом
+            прогоне (у команд, записанных прерванным прогоном, список пуст).
         """
         logger.info(f"Начинаем парсинг топ-{max_teams} команд...")
         
@@ -320,14 +213,16 @@ class TeamParser:
             logger.error("Не удалось загрузить страницу рейтинга команд.")
             return []
             
-        teams = []
+        parse_started = time.monotonic()
+        
         # Обновляем селектор на правильный
         ranked_team_rows = soup.find_all('div', class_='ranked-team')
         
         logger.info(f"Найдено {len(ranked_team_rows)} команд на странице.")
 
+        ranked_teams = []
         for i, team_row in enumerate(ranked_team_rows):
-            if len(teams) >= max_teams:
+            if len(ranked_teams) >= max_teams:
                 logger.info(f"Достигнут лимит в {max_teams} команд.")
                 break
 
@@ -337,161 +232,176 @@ class TeamParser:
             if not team_data:
                 logger.warning(f"Пропуск команды #{i + 1}, не удалось извлечь базовые данные.")
                 continue
+            ranked_teams.append(team_data)
 
-            # Инициализируем парсер игроков, если он еще не создан
-            if not self.player_parser:
-                self.player_parser = PlayerParser()
-                # Передаем тот же драйвер, чтобы не создавать новый
-                self.player_parser.driver = self.driver
+        metrics.observe_parse('ranking', time.monotonic() - parse_started, len(ranked_teams))
 
-            # Парсим игроков этой команды
-            parsed_players = []
-            if team_data.get('players'):
-                logger.info(f"Начинаем парсинг игроков для команды {team_data['name']}...")
-                for player_info in team_data['players']:
-                    player_data = self.player_parser.parse_player(player_info['id'], player_info['nickname'])
-                    if player_data:
-                        # Сохраняем/обновляем данные игрока в БД сразу,
-                        # чтобы к моменту записи ростера игрок уже существовал.
-                        self.player_parser.save_player_to_database(player_data)
+        # Загружаем только игроков с устаревшей статистикой, новых в составе
+        # и из команд, сменивших место в рейтинге
+        if full_refresh:
+            players_to_fetch = {p['id'] for t in ranked_teams for p in t.get('players', [])}
+        else:
+            players_to_fetch = RefreshPlanner(self.db).plan(ranked_teams)
 
-                        parsed_players.append(player_data)
-                        logger.info(f"  - Игрок {player_info['nickname']} спарсен и сохранён успешно.")
-                    else:
-                        logger.warning(f"  - Не удалось спарсить игрока {player_info['nickname']}.")
-                    
-                    # Задержка между запросами к игрокам
-                    time.sleep(5)
-            
-            team_data['players'] = parsed_players
-            teams.append(team_data)
-            
-            logger.info(f"Команда {team_data['name']} и ее игроки спарсены. Всего команд: {len(teams)}/{max_teams}")
-            
-            # Задержка между запросами к командам
-            time.sleep(10)
+        # Прогресс прогона по дате рейтинга: отмечается после каждого записанного пакета
+        checkpoint = RunCheckpoint(f"ranking-{self._get_last_monday().isoformat()}")
+        if not resume:
+            checkpoint.clear()
+        players_to_fetch -= checkpoint.done_players
+        ranked_teams_to_write = [t for t in ranked_teams if t.get('hltv_id') not in checkpoint.done_teams]
+        if len(ranked_teams_to_write) < len(ranked_teams):
+            logger.info(f"Пропускаем {len(ranked_teams) - len(ranked_teams_to_write)} команд, записанных в прерванном прогоне")
 
-            self.save_team_to_database(team_data)
+        writer = BatchWriter(
+            self.db, DB_BATCH_SIZE,
+            on_flush=lambda teams, players: checkpoint.mark(teams=teams, players=players),
+        )
 
-        logger.info(f"Парсинг топ-{len(teams)} команд завершен.")
-        return teams
-    
-    def save_team_to_database(self, team_data: Dict[str, Any]) -> bool:
-        """Сохранить данные команды в базу данных"""
-        try:
-            # Проверяем существующую команду
-            existing_team = self.db.query(Team).filter(
-                Team.hltv_id == team_data['hltv_id']
-            ).first()
-            
-            # Подготовка безопасных значений
-            rank = team_data.get('rank') or 0
-            points = team_data.get('points') or 0
+        # Все команды (и пропущенные по контрольной точке) приводятся к одному виду:
+        # полный состав со страницы рейтинга нужен для синхронизации ростера
+        roster_infos: Dict[int, List[Dict[str, Any]]] = {}
+        for team_data in ranked_teams:
+            roster_infos[id(team_data)] = team_data.get('players', [])
+            team_data['roster'] = [player_info['id'] for player_info in roster_infos[id(team_data)]]
+            team_data['players'] = []
 
-            # Вычисляем tag (до 10 символов) — берём первые буквы слов
-            default_tag = ''.join([w[0] for w in team_data['name'].split()][:4]).upper()[:10]
+        # Команда записывается, когда по всем ее загружаемым игрокам пришел результат
+        player_infos: Dict[int, Dict[str, Any]] = {}
+        teams_by_player: Dict[int, List[Dict[str, Any]]] = {}
+        remaining: Dict[int, int] = {}
+        for team_data in ranked_teams_to_write:
+            fetch_infos = [
+                player_info for player_info in roster_infos[id(team_data)] if player_info['id'] in players_to_fetch
+            ]
+            remaining[id(team_data)] = len(fetch_infos)
+            for player_info in fetch_infos:
+                player_infos[player_info['id']] = player_info
+                teams_by_player.setdefault(player_info['id'], []).append(team_data)
+            if not fetch_infos:
+                writer.add_team(team_data)
 
-            if existing_team:
-                # Обновляем существующую команду
-                team = existing_team
-                logger.info(f"Обновлена команда: {team_data['name']}")
+        # Статистика со страниц списка /stats/players вместо страницы каждого игрока
+        listed: Dict[int, Dict[str, Any]] = self._fetch_stats_listings() if bulk_stats and player_infos else {}
 
-                team.name = team_data['name']
-                team.world_ranking = rank
-                team.points = points
-                team.hltv_url = team_data['hltv_url']
-
-                if not team.tag:
-                    team.tag = default_tag
-            
+        def persist(player_info: Dict[str, Any], player_data: Optional[Dict[str, Any]]) -> None:
+            if player_data and player_info['id'] in listed:
+                merge_listing_stats(player_data, listed[player_info['id']])
+            if player_data:
+                logger.info(f"  - Игрок {player_info['nickname']} спарсен успешно.")
+                metrics.PARSE_ELEMENTS.labels('player').observe(count_player_stats(player_data))
+                # Игрок пишется сразу, не дожидаясь команды, чтобы попасть в контрольную точку
+                writer.add_player(player_data)
             else:
-                # Создаем новую команду
-                team = Team(
-                    hltv_id=team_data['hltv_id'],
-                    name=team_data['name'],
-                    world_ranking=rank,
-                    points=points,
-                    hltv_url=team_data['hltv_url'],
-                    tag=default_tag,
-                    is_active=True,
-                )
-                
-                self.db.add(team)
-                logger.info(f"Создана новая команда: {team_data['name']}")
-            
-            self.db.commit()
-            self.db.refresh(team)
-            
-            # Сохраняем состав команды
-            if team_data.get('players'):
-                self._save_team_roster(team.id, team_data['players'])
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении команды {team_data.get('name', 'Unknown')}: {e}")
-            self.db.rollback()
-            return False
+                logger.warning(f"  - Не удалось спарсить игрока {player_info['nickname']}.")
+            for team_data in teams_by_player.get(player_info['id'], []):
+                if player_data:
+                    team_data['players'].append(player_data)
+                remaining[id(team_data)] -= 1
+                if remaining[id(team_data)] == 0:
+                    logger.info(f"Команда {team_data['name']} и ее игроки спарсены.")
+                    # Игроки уже переданы в writer через add_player
+                    writer.add_team({**team_data, 'players': []})
+
+        if listed:
+            bulk, _ = plan_bulk_stats(self.db, listed, player_infos)
+            for hltv_id, player_data in bulk.items():
+                persist(player_infos.pop(hltv_id), player_data)
+
+        # Оставшиеся игроки — со страницы статистики своей команды, одна загрузка на состав
+        if team_stats and player_infos:
+            teams = {id(t): t for hltv_id in player_infos for t in teams_by_player[hltv_id]}
+            team_listed = self._fetch_team_stats(list(teams.values()))
+            for hltv_id, player_data in team_listed.items():
+                listed.setdefault(hltv_id, player_data)
+            bulk, _ = plan_bulk_stats(self.db, team_listed, player_infos)
+            for hltv_id, player_data in bulk.items():
+                persist(player_infos.pop(hltv_id), player_data)
+
+        # Загрузка страниц на пуле драйверов, разбор в пуле процессов,
+        # запись единственным потоком — стадии работают одновременно
+        pipeline = ScrapePipeline(
+            self.driver_pool,
+            fetch=self._fetch_player_html,
+            parse=_parse_player_page,
+            persist=persist,
+            parse_workers=PARSE_WORKERS,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            page_type='player',
+            stop_event=self.stop_event,
+        )
+        pipeline.run(player_infos.values())
+
+        if self.stop_event is not None and self.stop_event.is_set():
+            writer.flush()
+            logger.info(f"Прогон рейтинга остановлен, продолжится с контрольной точки {checkpoint.path}")
+            return ranked_teams
+        if writer.flush() and not writer.failed_batches:
+            checkpoint.clear()
+        logger.info(f"Парсинг топ-{len(ranked_teams)} команд завершен.")
+        return ranked_teams
     
-    def _save_team_roster(self, team_id: int, players: List[Dict[str, Any]]) -> bool:
-        """Сохранить состав команды"""
-        try:
-            # Удаляем старый состав
-            self.db.query(TeamRoster).filter(TeamRoster.team_id == team_id).delete()
-            
-            # Добавляем новый состав, избегая дублей
-            now = datetime.now()
-            for player_data in players:
-                player = self.db.query(Player).filter(
-                    Player.hltv_id == player_data['hltv_id']
-                ).first()
-                if not player:
-                    continue
+    def _fetch_stats_listings(self) -> Dict[int, Dict[str, Any]]:
+        """Загрузить статистику игроков со страниц списка /stats/players (браузер — из пула, если нужен)"""
+        return collect_stats_listings(self.page_fetcher)
+    
+    def _fetch_team_stats(self, teams: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Загрузить статистику игроков со страниц статистики команд (на пуле драйверов)"""
+        listed: Dict[int, Dict[str, Any]] = {}
 
-                # Проверяем, нет ли уже активной записи игрока в ростере
-                exists = self.db.query(TeamRoster).filter(
-                    TeamRoster.team_id == team_id,
-                    TeamRoster.player_id == player.id,
-                    TeamRoster.left_at.is_(None)
-                ).first()
-                if exists:
-                    continue
+        def collect(team_data: Dict[str, Any], team_listed: Optional[Dict[int, Dict[str, Any]]]) -> None:
+            if team_listed is None:
+                logger.warning(f"Не удалось загрузить статистику игроков команды {team_data['name']}")
+                return
+            # Со страницы команды берем только ее текущий состав (там есть и бывшие игроки)
+            for hltv_id in team_data['roster']:
+                if hltv_id in team_listed:
+                    listed.setdefault(hltv_id, team_listed[hltv_id])
 
-                roster_entry = TeamRoster(
-                    team_id=team_id,
-                    player_id=player.id,
-                    role='Player',  # Базовая роль
-                    joined_at=now,
-                    is_active=True
-                )
-                self.db.add(roster_entry)
-            
-            self.db.commit()
-            logger.info(f"Сохранен состав команды ID {team_id}: {len(players)} игроков")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении состава команды ID {team_id}: {e}")
-            self.db.rollback()
-            return False
+        pipeline = ScrapePipeline(
+            self.driver_pool,
+            fetch=self._fetch_team_stats_html,
+            parse=_parse_team_stats_page,
+            persist=collect,
+            parse_workers=PARSE_WORKERS,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            page_type='team_stats',
+            stop_event=self.stop_event,
+        )
+        pipeline.run(t for t in teams if t.get('hltv_id') and t.get('hltv_url'))
+        logger.info(f"Со страниц {len(teams)} команд получена статистика {len(listed)} игроков")
+        return listed
+    
+    def _fetch_team_stats_html(self, driver: WebDriver, team_data: Dict[str, Any]) -> Optional[str]:
+        """Загрузить статистику игроков команды на драйвере из пула (стадия fetch конвейера)"""
+        slug = team_data['hltv_url'].rstrip('/').rsplit('/', 1)[-1]
+        return fetch_team_stats_html(self.page_fetcher, team_data['hltv_id'], slug, driver=driver)
+    
+    def _fetch_player_html(self, driver: WebDriver, player_info: Dict[str, Any]) -> Optional[str]:
+        """Загрузить страницу игрока на драйвере из пула (стадия fetch конвейера)"""
+        return fetch_player_html(self.page_fetcher, player_info['id'], player_info['nickname'], driver=driver)
+    
+    def save_team_to_database(self, team_data: Dict[str, Any]) -> bool:
+        """Сохранить данные команды, ее игроков и состав в базу данных"""
+        writer = BatchWriter(self.db)
+        writer.add_team(team_data)
+        return writer.flush()
     
     def save_all_teams_to_database(self, teams: List[Dict[str, Any]]) -> int:
-        """Сохранить все команды в базу данных"""
-        saved_count = 0
-        
+        """Сохранить все команды в базу данных пакетами"""
+        writer = BatchWriter(self.db, DB_BATCH_SIZE)
         for team_data in teams:
-            if self.save_team_to_database(team_data):
-                saved_count += 1
+            writer.add_team(team_data)
+        writer.flush()
         
-        logger.info(f"Сохранено команд в базу данных: {saved_count} из {len(teams)}")
-        return saved_count
+        logger.info(f"Сохранено команд в базу данных: {writer.teams_written} из {len(teams)}")
+        return writer.teams_written
     
     def close(self):
         """Закрыть соединения"""
-        if self.driver:
-            self.driver.quit()
-        if self.player_parser:
-            self.player_parser.close()
+        if self.driver_pool and self._owns_driver_pool:
+            self.driver_pool.close()
+        if self.http_fetcher and self._owns_http_fetcher:
+            self.http_fetcher.close()
         if self.db:
             self.db.close()
     
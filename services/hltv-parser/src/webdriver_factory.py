@@ -0,0 +1,425 @@
+"""
+Stealth Firefox WebDriver factory
+Фабрика headless Firefox драйверов для парсеров HLTV
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import itertools
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows: готовые профили не используются
+    fcntl = None  # type: ignore
+
+from selenium import webdriver
+from selenium.webdriver.firefox.options import Options
+from selenium.webdriver.firefox.service import Service as FirefoxService
+from selenium.webdriver.firefox.webdriver import WebDriver
+import geckodriver_autoinstaller
+
+from config.settings import (
+    BROWSER_RESOURCE_BLOCKING, HLTV_BASE_URL, GECKODRIVER_PATH, GECKODRIVER_PATH_FILE, GECKODRIVER_CHECK_INTERVAL,
+    GECKODRIVER_CHECK_TIMEOUT, GECKODRIVER_OFFLINE, BROWSER_PREBUILT_PROFILE, BROWSER_PROFILE_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0"
+
+# Несуществующий прокси: запросы к заблокированным хостам сразу завершаются ошибкой
+_BLACKHOLE_PROXY = "PROXY 127.0.0.1:9"
+
+
+def _blocked_hosts_pac(hosts) -> str:
+    """Собрать PAC-скрипт, отправляющий запросы к hosts (и поддоменам) в никуда"""
+    script = (
+        "function FindProxyForURL(url, host) {"
+        f" var blocked = [{', '.join(repr(h) for h in hosts)}];"
+        " for (var i = 0; i < blocked.length; i++) {"
+        "  if (host == blocked[i] || dnsDomainIs(host, '.' + blocked[i])) {"
+        f"   return '{_BLACKHOLE_PROXY}';"
+        "  }"
+        " }"
+        " return 'DIRECT';"
+        "}"
+    )
+    return "data:application/x-ns-proxy-autoconfig," + quote(script)
+
+
+def resource_blocking_preferences(config: Dict[str, Any] = BROWSER_RESOURCE_BLOCKING) -> Dict[str, Any]:
+    """
+    Настройки Firefox, отключающие загрузку ресурсов, не нужных для парсинга.
+
+    Картинки, видео, шрифты (и, по желанию, стили) не загружаются; запросы к
+    рекламным и аналитическим доменам из ``blocked_hosts`` обрываются через PAC-скрипт.
+    Документ HLTV и скрипты Cloudflare загружаются как обычно.
+    """
+    prefs: Dict[str, Any] = {}
+    if not config['enabled']:
+        return prefs
+
+    if config['images']:
+        prefs["permissions.default.image"] = 2
+    if config['media']:
+        prefs["media.autoplay.default"] = 5
+        prefs["media.autoplay.blocking_policy"] = 2
+        prefs["media.mediasource.enabled"] = False
+    if config['fonts']:
+        prefs["gfx.downloadable_fonts.enabled"] = False
+        prefs["browser.display.use_document_fonts"] = 0
+    if config['stylesheets']:
+        prefs["permissions.default.stylesheet"] = 2
+
+    if config['blocked_hosts']:
+        prefs["network.proxy.type"] = 2
+        prefs["network.proxy.autoconfig_url"] = _blocked_hosts_pac(config['blocked_hosts'])
+    return prefs
+
+
+def stealth_preferences() -> Dict[str, Any]:
+    """Настройки профиля Firefox для обхода детекции ботов"""
+    prefs: Dict[str, Any] = {
+        # Стандартный User-Agent
+        "general.useragent.override": USER_AGENT,
+
+        # Настройки для обхода детекции веб-драйвера
+        "dom.webdriver.enabled": False,
+        "useAutomationExtension": False,
+        "marionette.enabled": False,
+
+        # Отключаем автоматизацию в navigator
+        "dom.disable_beforeunload": True,
+        "dom.successive_dialog_time_limit": 0,
+
+        # Настройки для имитации реального браузера
+        "network.http.connection-retry-timeout": 0,
+
+        # Включаем JavaScript (нужен для HLTV)
+        "javascript.enabled": True,
+
+        # Настройки приватности
+        "privacy.trackingprotection.enabled": False,
+        "network.cookie.cookieBehavior": 0,
+
+        # Языковые настройки
+        "intl.accept_languages": "en-US,en;q=0.9",
+
+        # Дополнительные настройки для обхода детекции
+        "media.peerconnection.enabled": False,
+        "media.navigator.enabled": False,
+        "webgl.disabled": True,
+        "media.autoplay.default": 0,
+
+        # Настройки времени загрузки
+        "network.http.connection-timeout": 120,
+        "network.http.response.timeout": 120,
+    }
+
+    # Не загружаем картинки, шрифты, рекламу и аналитику
+    prefs.update(resource_blocking_preferences())
+    return prefs
+
+
+def _build_stealth_profile() -> webdriver.FirefoxProfile:
+    """Собрать временный профиль Firefox (Selenium упаковывает его и передает браузеру)"""
+    firefox_profile = webdriver.FirefoxProfile()
+    for name, value in stealth_preferences().items():
+        firefox_profile.set_preference(name, value)
+    return firefox_profile
+
+
+# ---- geckodriver -----------------------------------------------------------------
+
+_geckodriver_lock = threading.Lock()
+_geckodriver_path: Optional[str] = None
+
+
+def _is_executable(path: Optional[str]) -> bool:
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def _install_geckodriver() -> Optional[str]:
+    """
+    Онлайн-проверка версии geckodriver не дольше GECKODRIVER_CHECK_TIMEOUT секунд.
+
+    geckodriver_autoinstaller не принимает таймаут, поэтому проверка идет в отдельном
+    потоке; зависший поток оставляется в фоне, глобальные настройки сокетов не меняются.
+    """
+    result: Dict[str, Optional[str]] = {}
+
+    def install() -> None:
+        try:
+            result['path'] = geckodriver_autoinstaller.install()
+        except Exception as e:
+            logger.warning(f"Не удалось проверить версию geckodriver: {e}")
+
+    thread = threading.Thread(target=install, name='geckodriver-check', daemon=True)
+    thread.start()
+    thread.join(GECKODRIVER_CHECK_TIMEOUT)
+    if thread.is_alive():
+        logger.warning(f"Проверка версии geckodriver не завершилась за {GECKODRIVER_CHECK_TIMEOUT} с")
+        return None
+    return result.get('path')
+
+
+def resolve_geckodriver() -> Optional[str]:
+    """
+    Путь к geckodriver, определяемый один раз на процесс.
+
+    Порядок: ``GECKODRIVER_PATH``; путь, сохраненный прошлыми запусками в
+    ``GECKODRIVER_PATH_FILE`` (онлайн-проверка версии через geckodriver_autoinstaller —
+    не чаще ``GECKODRIVER_CHECK_INTERVAL``, в том числе после неудачной проверки;
+    при заданном ``GECKODRIVER_PATH`` или ``GECKODRIVER_OFFLINE`` сохраненный путь
+    используется без проверки); geckodriver из PATH. None — драйвер ищет сам Selenium.
+    """
+    global _geckodriver_path
+    with _geckodriver_lock:
+        if _geckodriver_path:
+            return _geckodriver_path
+
+        if _is_executable(GECKODRIVER_PATH):
+            _geckodriver_path = GECKODRIVER_PATH
+            return _geckodriver_path
+
+        saved, checked_at = None, 0.0
+        try:
+            with open(GECKODRIVER_PATH_FILE, 'r', encoding='utf-8') as f:
+                saved = f.read().strip()
+            checked_at = os.path.getmtime(GECKODRIVER_PATH_FILE)
+        except OSError:
+            pass
+
+        path = saved if _is_executable(saved) else None
+        offline = GECKODRIVER_OFFLINE or bool(GECKODRIVER_PATH)
+        if path is None or (not offline and time.time() - checked_at > GECKODRIVER_CHECK_INTERVAL):
+            installed = _install_geckodriver()
+            if not _is_executable(installed) and path is not None:
+                # Следующая проверка — через GECKODRIVER_CHECK_INTERVAL, а не при каждом запуске
+                try:
+                    os.utime(GECKODRIVER_PATH_FILE)
+                except OSError:
+                    pass
+            if _is_executable(installed):
+                path = installed
+                try:
+                    os.makedirs(os.path.dirname(GECKODRIVER_PATH_FILE), exist_ok=True)
+                    with open(GECKODRIVER_PATH_FILE, 'w', encoding='utf-8') as f:
+                        f.write(path)
+                except OSError as e:
+                    logger.warning(f"Не удалось сохранить путь к geckodriver: {e}")
+
+        path = path or shutil.which('geckodriver')
+        if path:
+            logger.info(f"Используем geckodriver: {path}")
+        else:
+            logger.warning("geckodriver не найден, драйвер будет искать Selenium")
+        _geckodriver_path = path
+        return path
+
+
+# ---- Готовые профили -------------------------------------------------------------
+
+# Дополнительно для переиспользуемых профилей: не восстанавливать вкладки после падения
+_REUSABLE_PROFILE_PREFS = {
+    "browser.sessionstore.resume_from_crash": False,
+    "browser.shell.checkDefaultBrowser": False,
+}
+
+
+def _user_js(prefs: Dict[str, Any]) -> str:
+    return ''.join(f"user_pref({json.dumps(name)}, {json.dumps(value)});\n" for name, value in prefs.items())
+
+
+def claim_profile_dir(root: str = BROWSER_PROFILE_DIR) -> Tuple[str, int]:
+    """
+    Занять свободный каталог профиля в root и подготовить его.
+
+    Каталоги slot-N переиспользуются между запусками: Firefox не создает профиль
+    заново, а Selenium не упаковывает и не копирует его. Занятость отмечается
+    блокировкой flock на slot-N.lock (снимается при закрытии драйвера или
+    завершении процесса), поэтому параллельные браузеры получают разные каталоги.
+    Настройки пишутся в user.js, только если они изменились.
+
+    Returns:
+        (путь к каталогу профиля, дескриптор файла блокировки)
+    """
+    os.makedirs(root, exist_ok=True)
+    for slot in itertools.count():
+        lock_fd = os.open(os.path.join(root, f"slot-{slot}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(lock_fd)
+            continue
+
+        try:
+            profile_dir = os.path.join(root, f"slot-{slot}")
+            os.makedirs(profile_dir, exist_ok=True)
+            user_js = _user_js({**stealth_preferences(), **_REUSABLE_PROFILE_PREFS})
+            user_js_path = os.path.join(profile_dir, 'user.js')
+            try:
+                with open(user_js_path, 'r', encoding='utf-8') as f:
+                    current = f.read()
+            except OSError:
+                current = None
+            if current != user_js:
+                with open(user_js_path, 'w', encoding='utf-8') as f:
+                    f.write(user_js)
+        except Exception:
+            release_profile_dir(lock_fd)
+            raise
+        return profile_dir, lock_fd
+
+
+def release_profile_dir(lock_fd: Optional[int]) -> None:
+    """Освободить каталог профиля, занятый claim_profile_dir"""
+    if lock_fd is None:
+        return
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_UN)
+    finally:
+        os.close(lock_fd)
+
+
+class StealthFirefox(webdriver.Firefox):
+    """Firefox WebDriver, считающий загруженные страницы (для перезапуска после N страниц)"""
+
+    def __init__(self, *args, profile_lock: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pages_loaded = 0
+        self.profile_lock = profile_lock
+
+    def get(self, url: str) -> None:
+        self.pages_loaded += 1
+        super().get(url)
+
+    def quit(self) -> None:
+        try:
+            super().quit()
+        finally:
+            lock, self.profile_lock = self.profile_lock, None
+            release_profile_dir(lock)
+
+
+def create_stealth_driver(cookies: Optional[List[Dict[str, Any]]] = None) -> WebDriver:
+    """Создать headless Firefox драйвер со stealth-профилем.
+
+    :param cookies: cookies HLTV (например, из CookieStore), которые нужно добавить в браузер.
+    """
+    profile_lock = None
+    try:
+        logger.info("Инициализируем stealth Firefox...")
+
+        # Путь к geckodriver определяется один раз на процесс и запоминается между запусками
+        geckodriver_path = resolve_geckodriver()
+
+        firefox_options = Options()
+        firefox_options.add_argument("--headless")
+        firefox_options.add_argument("--no-sandbox")
+        firefox_options.add_argument("--disable-dev-shm-usage")
+        firefox_options.add_argument("--window-size=1920,1080")
+        if BROWSER_PREBUILT_PROFILE and fcntl is not None:
+            # Готовый каталог профиля: Firefox запускается прямо из него
+            profile_dir, profile_lock = claim_profile_dir()
+            firefox_options.add_argument("-profile")
+            firefox_options.add_argument(profile_dir)
+        else:
+            firefox_options.profile = _build_stealth_profile()
+        logger.info(f"Используем User-Agent: {USER_AGENT}")
+
+        service = FirefoxService(executable_path=geckodriver_path)
+        driver = StealthFirefox(service=service, options=firefox_options, profile_lock=profile_lock)
+        profile_lock = None  # теперь блокировку снимет driver.quit()
+        driver.set_page_load_timeout(60)  # Увеличиваем таймаут
+        driver.implicitly_wait(15)
+
+        # Устанавливаем размер окна для имитации реального браузера
+        driver.set_window_size(1920, 1080)
+
+        # Выполняем JavaScript для дополнительного сокрытия автоматизации
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+
+        if cookies:
+            inject_cookies(driver, cookies)
+
+        logger.info("Stealth Firefox инициализирован успешно")
+        return driver
+
+    except Exception as e:
+        logger.error(f"Ошибка инициализации Firefox драйвера: {e}")
+        if profile_lock is not None:
+            release_profile_dir(profile_lock)
+        raise
+
+
+def inject_cookies(driver: WebDriver, cookies: List[Dict[str, Any]]) -> int:
+    """
+    Добавить cookies HLTV (в том числе cf_clearance) в браузер.
+
+    Selenium добавляет cookies только для текущего домена, поэтому сначала
+    открывается легкая страница HLTV (robots.txt). Возвращает число добавленных cookies.
+    """
+    host = urlparse(HLTV_BASE_URL).hostname or ''
+    cookies = [c for c in cookies if c.get('domain') and host.endswith(c['domain'].lstrip('.'))]
+    if not cookies:
+        return 0
+
+    driver.get(f"{HLTV_BASE_URL}/robots.txt")
+    added = 0
+    for cookie in cookies:
+        try:
+            driver.add_cookie(cookie)
+            added += 1
+        except Exception as e:
+            logger.debug(f"Не удалось добавить cookie {cookie.get('name')}: {e}")
+    logger.info(f"В браузер добавлено {added} cookies HLTV")
+    return added
+
+
+def _list_dir(path: str) -> List[str]:
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+
+def browser_rss_mb(driver: WebDriver) -> Optional[float]:
+    """
+    Память (RSS, МБ) процесса Firefox вместе с дочерними content-процессами.
+
+    Читается из /proc, поэтому работает только на Linux; иначе возвращает None.
+    """
+    pid = driver.capabilities.get('moz:processID')
+    if not pid:
+        return None
+
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            if current == pid:
+                return None
+            continue
+        # Content-процессы запускаются из отдельного потока Firefox, поэтому дочерние
+        # процессы собираются по всем потокам, а не только по главному
+        for task in _list_dir(f"/proc/{current}/task"):
+            try:
+                with open(f"/proc/{current}/task/{task}/children") as children:
+                    pending.extend(int(child) for child in children.read().split())
+            except (OSError, ValueError):
+                continue
+    return total_kb / 1024